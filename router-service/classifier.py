@@ -1,16 +1,36 @@
 """
 Shared classifier module for the agent router.
 
-Contains the canonical AGENT_CAPABILITIES, SPECIALIZED_TASKS,
+Contains the canonical (read-only) AGENT_CAPABILITIES, SPECIALIZED_TASKS,
 classify_prompt(), detect_specialized_task(), select_agent(),
 and check_installed_agents() used by both the FastAPI server
 (router.py) and the standalone CLI (route_cli.py).
 """
 
+import bisect
+import functools
+import heapq
 import re
-import subprocess
+import shutil
+import sys
 import time
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from keyword_matcher import KeywordMatcher
 
 
 # ============================================================================
@@ -107,6 +127,13 @@ AGENT_CAPABILITIES = {
 }
 
 
+# Executable name for each agent's CLI, resolved once instead of per probe
+_AGENT_EXECUTABLES = {
+    agent: caps["cli_command"].partition(" ")[0]
+    for agent, caps in AGENT_CAPABILITIES.items()
+}
+
+
 # ============================================================================
 # Specialized Task Routing
 # ============================================================================
@@ -377,147 +404,350 @@ SPECIALIZED_TASKS = {
 }
 
 
+def _freeze(obj: Any) -> Any:
+    """Recursively convert dicts to read-only mappings and lists to tuples."""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Return a plain dict/list copy of a frozen table (e.g. for JSON output)."""
+    if isinstance(obj, Mapping):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+# Both tables are read-only configuration; freezing them turns accidental
+# mutation into an error and stores keyword lists as compact tuples
+AGENT_CAPABILITIES = _freeze(AGENT_CAPABILITIES)
+SPECIALIZED_TASKS = _freeze(SPECIALIZED_TASKS)
+
+
 # ============================================================================
 # Installed agents cache
 # ============================================================================
 
 _installed_agents_cache: Optional[Dict[str, bool]] = None
-_cache_timestamp: float = 0
+_cache_deadline_ns: int = 0
+_CACHE_TTL_NS = 300_000_000_000  # 5 minutes
 
 
 def check_installed_agents(force_refresh: bool = False) -> Dict[str, bool]:
     """
     Check which AI CLI agents are installed on the system.
-    Caches results for 5 minutes to avoid repeated subprocess calls.
+    Caches results for 5 minutes to avoid repeated PATH lookups.
     """
-    global _installed_agents_cache, _cache_timestamp
+    global _installed_agents_cache, _cache_deadline_ns
 
     if not force_refresh and _installed_agents_cache is not None:
-        if time.time() - _cache_timestamp < 300:
+        if time.monotonic_ns() < _cache_deadline_ns:
             return _installed_agents_cache
 
-    installed = {}
-
-    for agent, caps in AGENT_CAPABILITIES.items():
-        cli_cmd = caps["cli_command"].split()[0]
-        try:
-            result = subprocess.run(["which", cli_cmd], capture_output=True, timeout=5)
-            installed[agent] = result.returncode == 0
-        except Exception:
-            installed[agent] = False
+    # In-process PATH lookups, no fork/exec of `which`
+    installed = {
+        agent: shutil.which(executable) is not None
+        for agent, executable in _AGENT_EXECUTABLES.items()
+    }
 
     _installed_agents_cache = installed
-    _cache_timestamp = time.time()
+    _cache_deadline_ns = time.monotonic_ns() + _CACHE_TTL_NS
 
     return installed
 
 
+def invalidate_installed_cache() -> None:
+    """Make the next check_installed_agents() call re-probe PATH."""
+    global _installed_agents_cache, _cache_deadline_ns
+
+    _installed_agents_cache = None
+    _cache_deadline_ns = 0
+
+
 # ============================================================================
-# Specialized task detection
+# Prompt normalization
 # ============================================================================
 
 
-def detect_specialized_task(prompt: str) -> Optional[Dict[str, Any]]:
-    """Detect if prompt matches a specialized task pattern."""
+@dataclass(frozen=True)
+class NormalizedPrompt:
+    """A prompt with the derived forms shared by detection and classification."""
+
+    raw: str
+    lower: str
+    words: Tuple[str, ...]
+    tokens: FrozenSet[str]  # distinct alphabetic runs, for whole-word checks
+
+
+_WORD_PATTERN = re.compile(r"[a-z]+")
+
+# Prompts longer than this (pasted logs, whole files) are not memoized: they
+# rarely repeat verbatim, and each cache entry pins the prompt text as its
+# key, so a few of them could hold megabytes across the per-prompt caches.
+_MAX_MEMOIZED_PROMPT_CHARS = 4096
+
+_T = TypeVar("_T")
+
+
+def _memoize_prompt(
+    maxsize: int,
+) -> Callable[[Callable[[str], _T]], Callable[[str], _T]]:
+    """lru_cache for single-prompt functions that skips over-long prompts."""
+
+    def decorator(func: Callable[[str], _T]) -> Callable[[str], _T]:
+        cached = functools.lru_cache(maxsize=maxsize)(func)
+
+        @functools.wraps(func)
+        def wrapper(prompt: str) -> _T:
+            if len(prompt) > _MAX_MEMOIZED_PROMPT_CHARS:
+                return func(prompt)
+            return cached(prompt)
+
+        wrapper.cache_clear = cached.cache_clear  # type: ignore[attr-defined]
+        wrapper.cache_info = cached.cache_info  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
+
+
+@_memoize_prompt(maxsize=256)
+def _normalize(prompt: str) -> NormalizedPrompt:
+    """Lower-case and split a prompt once per distinct string."""
     prompt_lower = prompt.lower()
+    return NormalizedPrompt(
+        raw=prompt,
+        lower=prompt_lower,
+        words=tuple(prompt_lower.split()),
+        tokens=frozenset(_WORD_PATTERN.findall(prompt_lower)),
+    )
 
-    best_match = None
-    best_confidence = 0.0
 
-    for task_name, task_config in SPECIALIZED_TASKS.items():
-        keywords = task_config["keywords"]
-        single_match_keywords = task_config.get("single_match_keywords", [])
-
-        # Strong single-keyword signals
-        single_matches = [kw for kw in single_match_keywords if kw in prompt_lower]
-        if single_matches:
-            confidence = 0.85 + task_config.get("confidence_boost", 0)
-            if confidence > best_confidence:
-                best_confidence = confidence
-                best_match = {
-                    "specialized_task": task_name,
-                    "agent": task_config["agent"],
-                    "mode": task_config["mode"],
-                    "model_tier": task_config["model_tier"],
-                    "reasoning": task_config["reasoning"],
-                    "confidence": confidence,
-                    "matched_keywords": single_matches,
-                }
-            continue
+# ============================================================================
+# Scoring helpers
+# ============================================================================
 
-        # Multiple keyword matches
-        matches = [kw for kw in keywords if kw in prompt_lower]
-        if len(matches) >= 2:
-            confidence = min(0.8 + (len(matches) * 0.05), 0.95)
-            if confidence > best_confidence:
-                best_confidence = confidence
-                best_match = {
-                    "specialized_task": task_name,
-                    "agent": task_config["agent"],
-                    "mode": task_config["mode"],
-                    "model_tier": task_config["model_tier"],
-                    "reasoning": task_config["reasoning"],
-                    "confidence": confidence,
-                    "matched_keywords": matches,
-                }
-        elif len(matches) == 1:
-            # Single keyword with supporting context
-            supporting = any(
-                ctx in prompt_lower
-                for ctx in [
-                    "codebase",
-                    "project",
-                    "repo",
-                    "module",
-                    "component",
-                    "system",
-                    "authentication",
-                    "api",
-                    "database",
-                    "service",
-                    "handler",
-                ]
-            )
-            if supporting:
-                confidence = 0.7
-                if confidence > best_confidence:
-                    best_confidence = confidence
-                    best_match = {
-                        "specialized_task": task_name,
-                        "agent": task_config["agent"],
-                        "mode": task_config["mode"],
-                        "model_tier": task_config["model_tier"],
-                        "reasoning": task_config["reasoning"],
-                        "confidence": confidence,
-                        "matched_keywords": matches,
-                    }
-
-    return best_match
+
+def _clamp(value: float, low: float, high: float) -> float:
+    """Limit value to [low, high] without the min()/max() call overhead."""
+    return low if value < low else high if value > high else value
+
+
+def _round2(value: float) -> float:
+    """
+    Round a non-negative score to two decimals.
+
+    Scores are sums of whole-cent steps, so half-cent ties (where this would
+    differ from round()'s half-to-even) can't occur.
+    """
+    return int(value * 100 + 0.5) / 100
 
 
 # ============================================================================
-# Classification
+# Specialized task detection
 # ============================================================================
 
 
-def classify_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
+# Struct-of-arrays view of SPECIALIZED_TASKS, indexed by task position.
+# The detection loop reads these tuples instead of per-task config dicts.
+_TASK_NAMES = tuple(SPECIALIZED_TASKS)
+_TASK_AGENTS = tuple(cfg["agent"] for cfg in SPECIALIZED_TASKS.values())
+_TASK_MODES = tuple(cfg["mode"] for cfg in SPECIALIZED_TASKS.values())
+_TASK_TIERS = tuple(cfg["model_tier"] for cfg in SPECIALIZED_TASKS.values())
+_TASK_REASONINGS = tuple(cfg["reasoning"] for cfg in SPECIALIZED_TASKS.values())
+_TASK_BOOSTS = tuple(
+    cfg.get("confidence_boost", 0) for cfg in SPECIALIZED_TASKS.values()
+)
+# Highest confidence any task can reach (multi-match cap vs. boosted single match)
+_MAX_SPECIALIZED_CONFIDENCE = max(0.95, 0.85 + max(_TASK_BOOSTS))
+_TASK_KEYWORDS = tuple(cfg["keywords"] for cfg in SPECIALIZED_TASKS.values())
+_TASK_SINGLE_KEYWORDS = tuple(
+    cfg.get("single_match_keywords", ()) for cfg in SPECIALIZED_TASKS.values()
+)
+
+
+def _build_specialized_index() -> Dict[str, List[Tuple[int, int, int]]]:
     """
-    Classify a prompt using rule-based keyword matching.
+    Map each specialized keyword to the tasks using it.
 
-    Detects task type (including research/exploration tasks) and estimates
-    complexity from multiple signals. Returns task type, complexity, and
-    confidence scores.
+    Each entry is (task_idx, single_rank, multi_rank): the keyword's position
+    in the task's single_match_keywords / keywords lists, or -1 if absent.
+    Ranks are used as bit positions in the per-task hit masks.
     """
-    prompt_lower = prompt.lower()
-    words = prompt_lower.split()
-    word_count = len(words)
+    index: Dict[str, List[Tuple[int, int, int]]] = {}
+    for task_idx, task_config in enumerate(SPECIALIZED_TASKS.values()):
+        keywords = task_config["keywords"]
+        single_match_keywords = task_config.get("single_match_keywords", ())
+        for kw in dict.fromkeys(single_match_keywords + keywords):
+            single_rank = (
+                single_match_keywords.index(kw) if kw in single_match_keywords else -1
+            )
+            multi_rank = keywords.index(kw) if kw in keywords else -1
+            index.setdefault(sys.intern(kw), []).append(
+                (task_idx, single_rank, multi_rank)
+            )
+    return index
+
+
+def _is_regex_keyword(kw: str) -> bool:
+    """Return True for keywords written as regex patterns (e.g. "why is.*failing")."""
+    return ".*" in kw or "\\" in kw or "[" in kw
+
+
+# Built once at import. Literal keywords are found by the shared prompt scan
+# (see _scan_keywords); regex-style keywords can't go through substring
+# matching, so each one is precompiled and searched separately.
+_SPECIALIZED_KEYWORD_INDEX = _build_specialized_index()
+_SPECIALIZED_PATTERNS = [
+    (kw, re.compile(kw)) for kw in _SPECIALIZED_KEYWORD_INDEX if _is_regex_keyword(kw)
+]
+
+# Words that make a lone keyword hit count as a specialized task. Matched
+# per word, so "api" no longer fires inside "rapid"; each word's plural is
+# derived below, and "microservice" is listed because whole-word matching no
+# longer finds "service" inside it.
+_SUPPORTING_WORDS = (
+    "codebase",
+    "project",
+    "repo",
+    "repository",
+    "module",
+    "component",
+    "system",
+    "authentication",
+    "api",
+    "database",
+    "service",
+    "microservice",
+    "handler",
+)
+
+
+def _plural(word: str) -> str:
+    """English plural for the regular nouns in _SUPPORTING_WORDS."""
+    if word.endswith("y"):
+        return word[:-1] + "ies"
+    return word + "s"
+
+
+_SUPPORTING_TOKENS = frozenset(
+    form for word in _SUPPORTING_WORDS for form in (word, _plural(word))
+)
+
+
+class _SpecializedMatch(NamedTuple):
+    """Immutable detection result, safe to share out of the LRU cache."""
+
+    specialized_task: str
+    agent: str
+    mode: str
+    model_tier: str
+    reasoning: str
+    confidence: float
+    matched_keywords: Tuple[str, ...]
 
-    task_type = None
-    confidence = 0.5
-    signals: List[str] = []
 
-    # -1. RESEARCH / EXPLORATION - highest priority
-    research_keywords = [
+def detect_specialized_task(prompt: str) -> Optional[Dict[str, Any]]:
+    """Detect if prompt matches a specialized task pattern."""
+    match = _detect_specialized_task_cached(prompt)
+    if match is None:
+        return None
+    result = match._asdict()
+    result["matched_keywords"] = list(match.matched_keywords)
+    return result
+
+
+@_memoize_prompt(maxsize=1024)
+def _detect_specialized_task_cached(prompt: str) -> Optional[_SpecializedMatch]:
+    """Memoized detection keyed on the raw prompt (retries, replays, CI reruns)."""
+    normalized = _normalize(prompt)
+    prompt_lower = normalized.lower
+
+    found = [kw for kw in _scan_keywords(prompt_lower) if kw in _SPECIALIZED_KEYWORDS]
+    found.extend(
+        kw for kw, pattern in _SPECIALIZED_PATTERNS if pattern.search(prompt_lower)
+    )
+
+    # Record hits per task as bitmasks over keyword list positions
+    n_tasks = len(_TASK_NAMES)
+    single_masks = [0] * n_tasks
+    multi_masks = [0] * n_tasks
+    hit_tasks = set()
+    for kw in found:
+        for task_idx, single_rank, multi_rank in _SPECIALIZED_KEYWORD_INDEX[kw]:
+            hit_tasks.add(task_idx)
+            if single_rank >= 0:
+                single_masks[task_idx] |= 1 << single_rank
+            if multi_rank >= 0:
+                multi_masks[task_idx] |= 1 << multi_rank
+
+    best_idx = -1
+    best_is_single = False
+    best_confidence = 0.0
+    supporting = None
+
+    # Tasks without any keyword hit can't match; visit the rest in table order
+    for task_idx in sorted(hit_tasks):
+        match_count = bin(multi_masks[task_idx]).count("1")
+
+        if single_masks[task_idx]:
+            # Strong single-keyword signals
+            confidence = 0.85 + _TASK_BOOSTS[task_idx]
+        elif match_count >= 2:
+            # Multiple keyword matches
+            confidence = _clamp(0.8 + (match_count * 0.05), 0.0, 0.95)
+        else:
+            # Single keyword with supporting context
+            if supporting is None:
+                supporting = not normalized.tokens.isdisjoint(_SUPPORTING_TOKENS)
+            if not supporting:
+                continue
+            confidence = 0.7
+
+        if confidence > best_confidence:
+            best_confidence = confidence
+            best_idx = task_idx
+            best_is_single = single_masks[task_idx] != 0
+            # Ties keep the earlier task, so nothing later can win
+            if best_confidence >= _MAX_SPECIALIZED_CONFIDENCE:
+                break
+
+    if best_idx < 0:
+        return None
+
+    # Only the winning task's mask is expanded back into keyword strings;
+    # bit order is list order, so no sorting is needed
+    if best_is_single:
+        mask, keywords = single_masks[best_idx], _TASK_SINGLE_KEYWORDS[best_idx]
+    else:
+        mask, keywords = multi_masks[best_idx], _TASK_KEYWORDS[best_idx]
+    matched_keywords = tuple(kw for i, kw in enumerate(keywords) if mask >> i & 1)
+
+    return _SpecializedMatch(
+        specialized_task=_TASK_NAMES[best_idx],
+        agent=_TASK_AGENTS[best_idx],
+        mode=_TASK_MODES[best_idx],
+        model_tier=_TASK_TIERS[best_idx],
+        reasoning=_TASK_REASONINGS[best_idx],
+        confidence=best_confidence,
+        matched_keywords=matched_keywords,
+    )
+
+
+# ============================================================================
+# Classification
+# ============================================================================
+
+
+# Keyword groups consulted by classify_prompt. Every group is matched in a
+# single pass over the prompt; _count_keyword_groups returns, per group, how
+# many of its keywords occur (the same count the old per-list scans produced).
+_CLASSIFY_KEYWORD_GROUPS: Dict[str, Tuple[str, ...]] = {
+    # Research / exploration
+    "research": (
         "research",
         "explore",
         "investigate",
@@ -545,222 +775,562 @@ def classify_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
         "examine",
         "study",
         "inspect",
-    ]
+    ),
+    # Code context that makes a lone research keyword count
+    "research_code_context": (
+        "codebase",
+        "repo",
+        "files",
+        "modules",
+        "code",
+        "implementation",
+        "across",
+        "throughout",
+        "all",
+        "entire",
+        "whole",
+        "project",
+    ),
+    # Code review
+    "review": (
+        "review",
+        "audit",
+        "check for",
+        "look for issues",
+        "security review",
+        "code review",
+        "pr review",
+        "pull request",
+        "vulnerability",
+        "best practices",
+        "code quality",
+    ),
+    # Code debugging
+    "debug": (
+        "fix",
+        "bug",
+        "debug",
+        "error",
+        "broken",
+        "failing",
+        "crash",
+        "exception",
+        "traceback",
+        "doesn't work",
+        "not working",
+        "wrong output",
+        "unexpected",
+        "fault",
+        "defect",
+    ),
+    # Code explanation
+    "explain": (
+        "explain",
+        "what does",
+        "how does",
+        "understand",
+        "walk through",
+        "describe",
+        "what is",
+        "tell me about",
+        "how is",
+        "why does",
+        "meaning of",
+        "purpose of",
+    ),
+    # Code context required for an explanation request
+    "explain_code_context": (
+        "code",
+        "function",
+        "class",
+        "module",
+        "method",
+        "variable",
+        "algorithm",
+        "pattern",
+        "regex",
+        "database",
+        "connection",
+        "api",
+        "endpoint",
+        "server",
+        "client",
+        "request",
+        "response",
+        "query",
+        "cache",
+        "pool",
+        "thread",
+        "process",
+        "async",
+        ".py",
+        ".js",
+        ".ts",
+        ".go",
+        ".rs",
+        ".java",
+        ".cpp",
+        "this file",
+        "this code",
+        "the code",
+        "this script",
+    ),
+    # Refactoring / rewrite
+    "refactor": (
+        "refactor",
+        "restructure",
+        "reorganize",
+        "clean up",
+        "improve",
+        "optimize",
+        "simplify",
+        "modernize",
+        "convert to",
+        "migrate",
+        "upgrade",
+        "rewrite",
+    ),
+    # Code generation verbs
+    "gen": (
+        "write",
+        "create",
+        "implement",
+        "build",
+        "add",
+        "generate",
+        "make",
+        "develop",
+        "set up",
+        "scaffold",
+        "bootstrap",
+    ),
+    # Code generation targets
+    "gen_context": (
+        "function",
+        "class",
+        "api",
+        "endpoint",
+        "module",
+        "script",
+        "component",
+        "service",
+        "handler",
+        "test",
+        "interface",
+        "method",
+        "route",
+        "middleware",
+        "hook",
+        "util",
+    ),
+    # Summarization
+    "summary": (
+        "summarize",
+        "summary",
+        "overview",
+        "tldr",
+        "brief",
+        "recap",
+        "key points",
+        "main points",
+        "gist",
+        # Whole-word group: forms that should count are listed explicitly
+        "summarizes",
+        "summarized",
+        "summarizing",
+        "summaries",
+        "summarization",
+        "overviews",
+        "briefly",
+        "recaps",
+    ),
+    # Math / algorithmic
+    "math": (
+        "calculate",
+        "compute",
+        "algorithm",
+        "complexity",
+        "big o",
+        "formula",
+        "equation",
+        "fibonacci",
+        "sort",
+        "search",
+        "optimize",
+        "efficient",
+        # Whole-word group: forms that should count are listed explicitly
+        "calculates",
+        "calculated",
+        "calculating",
+        "calculation",
+        "calculations",
+        "computes",
+        "computed",
+        "computing",
+        "computation",
+        "algorithms",
+        "algorithmic",
+        "equations",
+        "formulas",
+        "sorts",
+        "sorted",
+        "sorting",
+        "searches",
+        "searched",
+        "searching",
+        "optimizes",
+        "optimized",
+        "optimizing",
+        "efficiently",
+    ),
+    # Complexity signal 2: explicit high-complexity indicators
+    "high_complexity": (
+        "complex",
+        "advanced",
+        "sophisticated",
+        "comprehensive",
+        "full",
+        "complete",
+        "production",
+        "enterprise",
+        "scalable",
+        "distributed",
+        "concurrent",
+        "async",
+        "parallel",
+        # Whole-word group: forms that should count are listed explicitly
+        "completely",
+        "fully",
+        "asynchronous",
+        "concurrently",
+        "parallelize",
+        "parallelized",
+    ),
+    # Complexity signal 2: explicit low-complexity indicators
+    "low_complexity": (
+        "simple",
+        "basic",
+        "quick",
+        "small",
+        "tiny",
+        "minimal",
+        "just",
+        "only",
+        "single",
+        "one",
+        # Whole-word group: forms that should count are listed explicitly
+        "simply",
+        "basics",
+        "quickly",
+        "smaller",
+    ),
+    # Complexity signal 4: technical depth
+    "tech_depth": (
+        "authentication",
+        "authorization",
+        "oauth",
+        "jwt",
+        "encryption",
+        "database",
+        "caching",
+        "queue",
+        "websocket",
+        "graphql",
+        "grpc",
+        "kubernetes",
+        "docker",
+        "terraform",
+        "cicd",
+        "pipeline",
+        "microservice",
+        "architecture",
+        "design pattern",
+        "solid",
+        "transaction",
+        "rollback",
+        "migration",
+        "schema",
+    ),
+    # Complexity signal 5: file / scope indicators
+    "multi_file": (
+        "multiple files",
+        "several files",
+        "across",
+        "entire",
+        "whole codebase",
+        "all files",
+        "project-wide",
+        "repo",
+    ),
+    # Complexity signal 6: research scope
+    "research_scope": (
+        "entire",
+        "whole",
+        "all",
+        "every",
+        "across",
+        "throughout",
+        "complete",
+        "comprehensive",
+        "full",
+        "codebase",
+        "repo",
+    ),
+}
 
-    exploration_patterns = [
-        r"how does .* work",
-        r"where .* implemented",
-        r"find .* usage",
-        r"search .* for",
-        r"look .* across",
-        r"identify all .*",
-        r"list all .*",
-        r"show .* across",
-        r"find all .* in",
-    ]
+# Research phrasings that need a regex rather than a fixed keyword
+_EXPLORATION_PATTERN_SOURCES = (
+    r"how does .* work",
+    r"where .* implemented",
+    r"find .* usage",
+    r"search .* for",
+    r"look .* across",
+    r"identify all .*",
+    r"list all .*",
+    r"show .* across",
+    r"find all .* in",
+)
+_EXPLORATION_PATTERNS = tuple(re.compile(p) for p in _EXPLORATION_PATTERN_SOURCES)
+_EXPLORATION_ANY = re.compile(
+    "|".join(f"(?:{p})" for p in _EXPLORATION_PATTERN_SOURCES)
+)
 
-    research_matches = sum(1 for kw in research_keywords if kw in prompt_lower)
-    pattern_matches = sum(
-        1 for pattern in exploration_patterns if re.search(pattern, prompt_lower)
-    )
+
+# Groups whose single-word keywords must match whole words: as substrings
+# they misfire ("one" in "component", "compute" in "computer", "gist" in
+# "logistics"). Multi-word phrases in these groups still match as substrings.
+_WHOLE_WORD_GROUPS = frozenset({"summary", "math", "high_complexity", "low_complexity"})
+
+
+def _is_whole_word_keyword(group: str, kw: str) -> bool:
+    """Return True if kw is matched per word rather than as a substring."""
+    return group in _WHOLE_WORD_GROUPS and kw.isalpha()
+
+
+# Enumeration words counted by complexity signal 3 (after stripping ".):")
+_NUMBER_TOKENS = frozenset({"1", "2", "3", "4", "5", "first", "second", "third"})
+
+# Leading words that mark an open question (step 7), compared against the
+# prompt's first alphabetic run so "what's" counts but "whatever" does not
+_QUESTION_STARTS = frozenset({"what", "why", "how", "when", "where", "which", "can"})
+
+# Complexity signal 1: word-count limits (upper bound inclusive) and the
+# (score, signal) for each bucket they delimit
+_LENGTH_LIMITS = (30, 75, 150)
+_LENGTH_BUCKETS = ((0.0, "short"), (0.1, "medium"), (0.2, "long"), (0.3, "very_long"))
+
+# Final score cut-offs (lower bound inclusive) between complexity levels
+_COMPLEXITY_LIMITS = (0.35, 0.65)
+_COMPLEXITY_LEVELS = ("simple", "moderate", "complex")
+
+
+def _build_keyword_group_index() -> Dict[str, List[str]]:
+    """Map each substring-matched classification keyword to its groups."""
+    index: Dict[str, List[str]] = {}
+    for group, keywords in _CLASSIFY_KEYWORD_GROUPS.items():
+        for kw in keywords:
+            if not _is_whole_word_keyword(group, kw):
+                index.setdefault(sys.intern(kw), []).append(group)
+    return index
+
+
+def _build_whole_word_index() -> Dict[str, List[str]]:
+    """Map each whole-word classification keyword to its groups."""
+    index: Dict[str, List[str]] = {}
+    for group, keywords in _CLASSIFY_KEYWORD_GROUPS.items():
+        for kw in keywords:
+            if _is_whole_word_keyword(group, kw):
+                index.setdefault(sys.intern(kw), []).append(group)
+    return index
+
+
+_KEYWORD_GROUP_INDEX = _build_keyword_group_index()
+_WHOLE_WORD_INDEX = _build_whole_word_index()
+
+
+# ============================================================================
+# Shared keyword scan
+# ============================================================================
+
+# Literal keywords of both specialized detection and classification live in
+# one automaton, so routing a prompt (classify_prompt, then select_agent)
+# scans its text once instead of once per keyword table.
+_SPECIALIZED_KEYWORDS = frozenset(
+    kw for kw in _SPECIALIZED_KEYWORD_INDEX if not _is_regex_keyword(kw)
+)
+_PROMPT_MATCHER = KeywordMatcher(
+    [kw for kw in _SPECIALIZED_KEYWORD_INDEX if kw in _SPECIALIZED_KEYWORDS]
+    + list(_KEYWORD_GROUP_INDEX)
+)
+
+
+@_memoize_prompt(maxsize=256)
+def _scan_keywords(prompt_lower: str) -> FrozenSet[str]:
+    """Return every literal keyword, from either table, found in the prompt."""
+    return frozenset(_PROMPT_MATCHER.find(prompt_lower))
+
+
+def _starts_with_question_word(prompt_lower: str) -> bool:
+    """True if the prompt's leading alphabetic run is in _QUESTION_STARTS."""
+    first_word = _WORD_PATTERN.match(prompt_lower)
+    return first_word is not None and first_word.group() in _QUESTION_STARTS
+
+
+def _count_keyword_groups(normalized: NormalizedPrompt) -> Dict[str, int]:
+    """Count, per keyword group, how many of its keywords occur in the prompt."""
+    counts = dict.fromkeys(_CLASSIFY_KEYWORD_GROUPS, 0)
+    for kw in _scan_keywords(normalized.lower):
+        for group in _KEYWORD_GROUP_INDEX.get(kw, ()):
+            counts[group] += 1
+
+    # tokens is a set, so each whole-word keyword counts once
+    for kw in normalized.tokens.intersection(_WHOLE_WORD_INDEX):
+        for group in _WHOLE_WORD_INDEX[kw]:
+            counts[group] += 1
+    return counts
+
+
+class _Classification(NamedTuple):
+    """Immutable classification result, safe to share out of the LRU cache."""
+
+    task_type: str
+    task_type_confidence: float
+    complexity: str
+    complexity_score: float
+    task_signals: Tuple[str, ...]
+    complexity_signals: Tuple[str, ...]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Build the fresh, caller-owned dict returned by classify_prompt()."""
+        return {
+            "task_type": self.task_type,
+            "task_type_confidence": self.task_type_confidence,
+            "complexity": self.complexity,
+            "complexity_score": self.complexity_score,
+            "all_scores": {
+                "classifier": "rule_based_v2",
+                "task_signals": list(self.task_signals),
+                "complexity_signals": list(self.complexity_signals),
+            },
+        }
+
+
+def classify_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
+    """
+    Classify a prompt using rule-based keyword matching.
+
+    Detects task type (including research/exploration tasks) and estimates
+    complexity from multiple signals. Returns task type, complexity, and
+    confidence scores. Results are memoized per prompt; debug=True bypasses
+    the cache so the [DEBUG] trace is always printed.
+    """
+    if debug:
+        return _classify_prompt(prompt, debug=True).as_dict()
+    return _classify_prompt_cached(prompt).as_dict()
+
+
+def classify_prompts(prompts: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Classify many prompts (e.g. replaying routing logs) in input order.
+
+    Each distinct prompt is classified once. Results are memoized per batch
+    rather than in the shared LRU cache, so a large replay does not evict
+    the prompts the live service keeps seeing.
+    """
+    results: Dict[str, _Classification] = {}
+    out = []
+    for prompt in prompts:
+        result = results.get(prompt)
+        if result is None:
+            result = results[prompt] = _classify_prompt(prompt)
+        out.append(result.as_dict())
+    return out
+
+
+@_memoize_prompt(maxsize=1024)
+def _classify_prompt_cached(prompt: str) -> _Classification:
+    """Memoized classification keyed on the raw prompt."""
+    return _classify_prompt(prompt)
+
+
+def _classify_prompt(prompt: str, debug: bool = False) -> _Classification:
+    """Run the rule-based classifier; see classify_prompt()."""
+    normalized = _normalize(prompt)
+    prompt_lower = normalized.lower
+    words = normalized.words
+    word_count = len(words)
+    counts = _count_keyword_groups(normalized)
+    # Shared by the explanation (2) and open-QA (7) steps
+    is_question = "?" in prompt
+
+    task_type = None
+    confidence = 0.5
+    signals: List[str] = []
+
+    # -1. RESEARCH / EXPLORATION - highest priority
+    research_matches = counts["research"]
+    # One alternation pass settles the common no-match case; only prompts
+    # that hit something pay for counting the individual patterns
+    pattern_matches = 0
+    if _EXPLORATION_ANY.search(prompt_lower):
+        pattern_matches = sum(
+            1 for pattern in _EXPLORATION_PATTERNS if pattern.search(prompt_lower)
+        )
 
     if research_matches >= 2 or pattern_matches >= 1:
         task_type = "research"
-        confidence = min(
-            0.8 + (research_matches * 0.03) + (pattern_matches * 0.05), 0.95
+        confidence = _clamp(
+            0.8 + (research_matches * 0.03) + (pattern_matches * 0.05), 0.0, 0.95
         )
-        signals.append(f"research_keywords:{research_matches},patterns:{pattern_matches}")
-    elif research_matches == 1:
-        code_context = any(
-            kw in prompt_lower
-            for kw in [
-                "codebase",
-                "repo",
-                "files",
-                "modules",
-                "code",
-                "implementation",
-                "across",
-                "throughout",
-                "all",
-                "entire",
-                "whole",
-                "project",
-            ]
+        signals.append(
+            f"research_keywords:{research_matches},patterns:{pattern_matches}"
         )
-        if code_context:
+    elif research_matches == 1:
+        if counts["research_code_context"]:
             task_type = "research"
             confidence = 0.75
             signals.append("research_keywords:1,code_context")
 
     # 0. CODE REVIEW
     if not task_type:
-        review_keywords = [
-            "review",
-            "audit",
-            "check for",
-            "look for issues",
-            "security review",
-            "code review",
-            "pr review",
-            "pull request",
-            "vulnerability",
-            "best practices",
-            "code quality",
-        ]
-        review_matches = sum(1 for kw in review_keywords if kw in prompt_lower)
+        review_matches = counts["review"]
         if review_matches > 0:
             task_type = "code_review"
-            confidence = min(0.7 + (review_matches * 0.05), 0.95)
+            confidence = _clamp(0.7 + (review_matches * 0.05), 0.0, 0.95)
             signals.append(f"review_keywords:{review_matches}")
 
     # 1. CODE DEBUGGING
     if not task_type:
-        debug_keywords = [
-            "fix",
-            "bug",
-            "debug",
-            "error",
-            "broken",
-            "failing",
-            "crash",
-            "exception",
-            "traceback",
-            "doesn't work",
-            "not working",
-            "wrong output",
-            "unexpected",
-            "fault",
-            "defect",
-        ]
-        debug_matches = sum(1 for kw in debug_keywords if kw in prompt_lower)
+        debug_matches = counts["debug"]
         if debug_matches > 0:
             task_type = "code_debugging"
-            confidence = min(0.7 + (debug_matches * 0.05), 0.95)
+            confidence = _clamp(0.7 + (debug_matches * 0.05), 0.0, 0.95)
             signals.append(f"debug_keywords:{debug_matches}")
 
     # 2. CODE EXPLANATION
     if not task_type:
-        explain_keywords = [
-            "explain",
-            "what does",
-            "how does",
-            "understand",
-            "walk through",
-            "describe",
-            "what is",
-            "tell me about",
-            "how is",
-            "why does",
-            "meaning of",
-            "purpose of",
-        ]
-        code_context = any(
-            kw in prompt_lower
-            for kw in [
-                "code",
-                "function",
-                "class",
-                "module",
-                "method",
-                "variable",
-                "algorithm",
-                "pattern",
-                "regex",
-                "database",
-                "connection",
-                "api",
-                "endpoint",
-                "server",
-                "client",
-                "request",
-                "response",
-                "query",
-                "cache",
-                "pool",
-                "thread",
-                "process",
-                "async",
-                ".py",
-                ".js",
-                ".ts",
-                ".go",
-                ".rs",
-                ".java",
-                ".cpp",
-                "this file",
-                "this code",
-                "the code",
-                "this script",
-            ]
-        )
-        explain_matches = sum(1 for kw in explain_keywords if kw in prompt_lower)
-        if explain_matches > 0 and (code_context or "?" in prompt):
+        explain_matches = counts["explain"]
+        if explain_matches > 0 and (counts["explain_code_context"] or is_question):
             task_type = "code_explanation"
-            confidence = min(0.7 + (explain_matches * 0.05), 0.95)
+            confidence = _clamp(0.7 + (explain_matches * 0.05), 0.0, 0.95)
             signals.append(f"explain_keywords:{explain_matches}")
 
     # 3. REFACTORING / REWRITE
     if not task_type:
-        refactor_keywords = [
-            "refactor",
-            "restructure",
-            "reorganize",
-            "clean up",
-            "improve",
-            "optimize",
-            "simplify",
-            "modernize",
-            "convert to",
-            "migrate",
-            "upgrade",
-            "rewrite",
-        ]
-        refactor_matches = sum(1 for kw in refactor_keywords if kw in prompt_lower)
+        refactor_matches = counts["refactor"]
         if refactor_matches > 0:
             task_type = "rewrite"
-            confidence = min(0.7 + (refactor_matches * 0.05), 0.95)
+            confidence = _clamp(0.7 + (refactor_matches * 0.05), 0.0, 0.95)
             signals.append(f"refactor_keywords:{refactor_matches}")
 
     # 4. CODE GENERATION
     if not task_type:
-        gen_keywords = [
-            "write",
-            "create",
-            "implement",
-            "build",
-            "add",
-            "generate",
-            "make",
-            "develop",
-            "set up",
-            "scaffold",
-            "bootstrap",
-        ]
-        gen_context = [
-            "function",
-            "class",
-            "api",
-            "endpoint",
-            "module",
-            "script",
-            "component",
-            "service",
-            "handler",
-            "test",
-            "interface",
-            "method",
-            "route",
-            "middleware",
-            "hook",
-            "util",
-        ]
-        gen_matches = sum(1 for kw in gen_keywords if kw in prompt_lower)
-        context_matches = sum(1 for kw in gen_context if kw in prompt_lower)
+        gen_matches = counts["gen"]
+        context_matches = counts["gen_context"]
         if gen_matches > 0 and context_matches > 0:
             task_type = "code_generation"
-            confidence = min(
-                0.7 + (gen_matches * 0.03) + (context_matches * 0.03), 0.95
+            confidence = _clamp(
+                0.7 + (gen_matches * 0.03) + (context_matches * 0.03), 0.0, 0.95
             )
             signals.append(f"gen_keywords:{gen_matches},context:{context_matches}")
         elif gen_matches >= 2:
@@ -770,49 +1340,21 @@ def classify_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
 
     # 5. SUMMARIZATION
     if not task_type:
-        summary_keywords = [
-            "summarize",
-            "summary",
-            "overview",
-            "tldr",
-            "brief",
-            "recap",
-            "key points",
-            "main points",
-            "gist",
-        ]
-        if any(kw in prompt_lower for kw in summary_keywords):
+        if counts["summary"]:
             task_type = "summarization"
             confidence = 0.8
             signals.append("summary_keywords")
 
     # 6. MATH / ALGORITHMIC
     if not task_type:
-        math_keywords = [
-            "calculate",
-            "compute",
-            "algorithm",
-            "complexity",
-            "big o",
-            "formula",
-            "equation",
-            "fibonacci",
-            "sort",
-            "search",
-            "optimize",
-            "efficient",
-        ]
-        if any(kw in prompt_lower for kw in math_keywords):
+        if counts["math"]:
             task_type = "math"
             confidence = 0.75
             signals.append("math_keywords")
 
     # 7. OPEN QA
     if not task_type:
-        if "?" in prompt or any(
-            prompt_lower.startswith(q)
-            for q in ["what", "why", "how", "when", "where", "which", "can"]
-        ):
+        if is_question or _starts_with_question_word(prompt_lower):
             task_type = "open_qa"
             confidence = 0.6
             signals.append("question_pattern")
@@ -835,49 +1377,15 @@ def classify_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
     complexity_signals: List[str] = []
 
     # Signal 1: Prompt length
-    if word_count > 150:
-        complexity_score += 0.3
-        complexity_signals.append("very_long")
-    elif word_count > 75:
-        complexity_score += 0.2
-        complexity_signals.append("long")
-    elif word_count > 30:
-        complexity_score += 0.1
-        complexity_signals.append("medium")
-    else:
-        complexity_signals.append("short")
-
-    # Signal 2: Explicit complexity indicators
-    high_complexity = [
-        "complex",
-        "advanced",
-        "sophisticated",
-        "comprehensive",
-        "full",
-        "complete",
-        "production",
-        "enterprise",
-        "scalable",
-        "distributed",
-        "concurrent",
-        "async",
-        "parallel",
-    ]
-    low_complexity = [
-        "simple",
-        "basic",
-        "quick",
-        "small",
-        "tiny",
-        "minimal",
-        "just",
-        "only",
-        "single",
-        "one",
+    length_boost, length_signal = _LENGTH_BUCKETS[
+        bisect.bisect_left(_LENGTH_LIMITS, word_count)
     ]
+    complexity_score += length_boost
+    complexity_signals.append(length_signal)
 
-    high_matches = sum(1 for kw in high_complexity if kw in prompt_lower)
-    low_matches = sum(1 for kw in low_complexity if kw in prompt_lower)
+    # Signal 2: Explicit complexity indicators
+    high_matches = counts["high_complexity"]
+    low_matches = counts["low_complexity"]
 
     if high_matches > 0:
         complexity_score += 0.15 * high_matches
@@ -889,13 +1397,7 @@ def classify_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
     # Signal 3: Multiple requirements (bullet points, numbered lists, "and")
     and_count = prompt_lower.count(" and ")
     bullet_count = prompt.count("- ") + prompt.count("* ") + prompt.count("\u2022 ")
-    numbered = len(
-        [
-            w
-            for w in words
-            if w.rstrip(".):") in ["1", "2", "3", "4", "5", "first", "second", "third"]
-        ]
-    )
+    numbered = sum(1 for w in words if w.rstrip(".):") in _NUMBER_TOKENS)
 
     multi_req = and_count + bullet_count + numbered
     if multi_req > 3:
@@ -906,33 +1408,7 @@ def classify_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
         complexity_signals.append(f"multi_req:{multi_req}")
 
     # Signal 4: Technical depth indicators
-    tech_depth = [
-        "authentication",
-        "authorization",
-        "oauth",
-        "jwt",
-        "encryption",
-        "database",
-        "caching",
-        "queue",
-        "websocket",
-        "graphql",
-        "grpc",
-        "kubernetes",
-        "docker",
-        "terraform",
-        "cicd",
-        "pipeline",
-        "microservice",
-        "architecture",
-        "design pattern",
-        "solid",
-        "transaction",
-        "rollback",
-        "migration",
-        "schema",
-    ]
-    depth_matches = sum(1 for kw in tech_depth if kw in prompt_lower)
+    depth_matches = counts["tech_depth"]
     if depth_matches > 2:
         complexity_score += 0.2
         complexity_signals.append(f"tech_depth:{depth_matches}")
@@ -941,36 +1417,13 @@ def classify_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
         complexity_signals.append(f"tech_depth:{depth_matches}")
 
     # Signal 5: File/scope indicators
-    multi_file = [
-        "multiple files",
-        "several files",
-        "across",
-        "entire",
-        "whole codebase",
-        "all files",
-        "project-wide",
-        "repo",
-    ]
-    if any(kw in prompt_lower for kw in multi_file):
+    if counts["multi_file"]:
         complexity_score += 0.15
         complexity_signals.append("multi_file")
 
     # Signal 6: Research scope boost
     if task_type == "research":
-        research_scope = [
-            "entire",
-            "whole",
-            "all",
-            "every",
-            "across",
-            "throughout",
-            "complete",
-            "comprehensive",
-            "full",
-            "codebase",
-            "repo",
-        ]
-        scope_matches = sum(1 for kw in research_scope if kw in prompt_lower)
+        scope_matches = counts["research_scope"]
         if scope_matches >= 2:
             complexity_score += 0.20
             complexity_signals.append(f"research_scope:{scope_matches}")
@@ -979,30 +1432,24 @@ def classify_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
             complexity_signals.append(f"research_scope:{scope_matches}")
 
     # Normalize and categorize
-    complexity_score = max(0.1, min(0.95, complexity_score + 0.3))
+    complexity_score = _clamp(complexity_score + 0.3, 0.1, 0.95)
 
-    if complexity_score < 0.35:
-        complexity = "simple"
-    elif complexity_score < 0.65:
-        complexity = "moderate"
-    else:
-        complexity = "complex"
+    complexity = _COMPLEXITY_LEVELS[
+        bisect.bisect_right(_COMPLEXITY_LIMITS, complexity_score)
+    ]
 
     if debug:
         print(f"[DEBUG] Complexity: {complexity} ({complexity_score})")
         print(f"[DEBUG] Complexity signals: {complexity_signals}")
 
-    return {
-        "task_type": task_type,
-        "task_type_confidence": round(confidence, 2),
-        "complexity": complexity,
-        "complexity_score": round(complexity_score, 2),
-        "all_scores": {
-            "classifier": "rule_based_v2",
-            "task_signals": signals,
-            "complexity_signals": complexity_signals,
-        },
-    }
+    return _Classification(
+        task_type=task_type,
+        task_type_confidence=_round2(confidence),
+        complexity=complexity,
+        complexity_score=_round2(complexity_score),
+        task_signals=tuple(signals),
+        complexity_signals=tuple(complexity_signals),
+    )
 
 
 # ============================================================================
@@ -1010,6 +1457,178 @@ def classify_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
 # ============================================================================
 
 
+def _codex_mode(caps: Mapping[str, Any], tier: str) -> Optional[str]:
+    """Codex picks its reasoning effort from the model tier."""
+    if "reasoning_by_complexity" not in caps:
+        return None
+    if caps["reasoning_by_complexity"].get(tier, "medium") == "high":
+        return caps["modes"].get("high_reasoning")
+    return caps["modes"].get("medium_reasoning")
+
+
+def _cursor_mode(
+    caps: Mapping[str, Any], task_type: str, complexity: str
+) -> Optional[str]:
+    if task_type in ("planning", "architecture"):
+        return caps["modes"].get("plan")
+    if task_type in ("code_review", "code_explanation"):
+        return caps["modes"].get("ask")
+    return caps["modes"].get("agent")
+
+
+def _gemini_mode(
+    caps: Mapping[str, Any], task_type: str, complexity: str
+) -> Optional[str]:
+    if task_type in ("code_generation", "documentation", "rewrite"):
+        return caps["modes"].get("edit")
+    # Read mode (None) is default for research
+    return None
+
+
+def _copilot_mode(
+    caps: Mapping[str, Any], task_type: str, complexity: str
+) -> Optional[str]:
+    if task_type in ("code_generation", "refactoring", "rewrite"):
+        return caps["modes"].get("edit")
+    return None
+
+
+# Routing tables for the general path, built once rather than per call
+_AGENT_STRENGTHS = {
+    agent: frozenset(caps["strengths"]) for agent, caps in AGENT_CAPABILITIES.items()
+}
+_CURSOR_BONUS_TASKS = frozenset(
+    {"planning", "architecture", "rewrite", "code_debugging"}
+)
+_CODEX_NO_BONUS_TASKS = frozenset({"planning", "architecture", "research"})
+
+_FAST_AGENTS = frozenset(
+    agent for agent, caps in AGENT_CAPABILITIES.items() if caps["speed"] == "fast"
+)
+_LOW_COST_AGENTS = frozenset(
+    agent for agent, caps in AGENT_CAPABILITIES.items() if caps["cost"] == "low"
+)
+
+
+@functools.lru_cache(maxsize=128)
+def _base_agent_scores(
+    task_type: str, complexity: str
+) -> Tuple[Tuple[str, float], ...]:
+    """
+    Score every agent for a task type and complexity, in AGENT_CAPABILITIES
+    order, before speed/cost preferences and exclusions are applied.
+
+    Only a few dozen (task_type, complexity) pairs occur, so each is scored
+    once and select_agent just adds the per-request preference bonuses.
+    """
+    scores = []
+    for agent, caps in AGENT_CAPABILITIES.items():
+        score = 0.0
+
+        # Direct strength match
+        if task_type in _AGENT_STRENGTHS[agent]:
+            score += 0.5
+
+        # Task-specific routing bonuses
+        if agent == "gemini" and task_type == "code_generation":
+            score += 0.3
+        elif agent == "cursor" and task_type in _CURSOR_BONUS_TASKS:
+            score += 0.3
+        elif agent == "copilot" and complexity == "complex":
+            score += 0.2
+        elif agent == "codex" and task_type not in _CODEX_NO_BONUS_TASKS:
+            score += 0.1
+
+        # Complexity preference matching
+        if caps["complexity_preference"] == "any":
+            score += 0.15
+        elif caps["complexity_preference"] == complexity:
+            score += 0.25
+        elif caps["complexity_preference"] == "complex" and complexity == "moderate":
+            score += 0.1
+
+        scores.append((agent, score))
+    return tuple(scores)
+
+
+# Recommended mode for the general (non-specialized) path, keyed by agent
+_MODE_SELECTORS = {
+    "cursor": _cursor_mode,
+    "gemini": _gemini_mode,
+    "codex": lambda caps, task_type, complexity: _codex_mode(caps, complexity),
+    "copilot": _copilot_mode,
+}
+
+
+class _Selection(NamedTuple):
+    """Immutable general-path selection, safe to share out of the LRU cache."""
+
+    agent: str
+    confidence: float
+    reasoning: str
+    recommended_model: Optional[str]
+    recommended_mode: Optional[str]
+    alternatives: Tuple[Tuple[str, float], ...]  # (agent, rounded score)
+
+
+@functools.lru_cache(maxsize=1024)
+def _select_general_agent(
+    task_type: str,
+    complexity: str,
+    prefer_speed: bool,
+    prefer_cost: bool,
+    excluded: FrozenSet[str],
+) -> Optional[_Selection]:
+    """
+    Pick the best non-excluded agent by classification-based scoring.
+
+    Depends only on its (small, repetitive) arguments, so each combination
+    is scored once. Returns None when every agent is excluded.
+    """
+    agent_scores: Dict[str, float] = {}
+    for agent, score in _base_agent_scores(task_type, complexity):
+        if agent in excluded:
+            continue
+
+        # Speed/cost preferences
+        if prefer_speed and agent in _FAST_AGENTS:
+            score += 0.2
+        if prefer_cost and agent in _LOW_COST_AGENTS:
+            score += 0.2
+
+        agent_scores[agent] = score
+
+    if not agent_scores:
+        return None
+
+    # Only the winner and two alternatives are reported; nlargest keeps the
+    # same tie order as a stable descending sort.
+    top_agents = heapq.nlargest(3, agent_scores.items(), key=lambda x: x[1])
+    best_agent, best_score = top_agents[0]
+
+    best_score = _clamp(best_score, 0.0, 1.0)
+
+    caps = AGENT_CAPABILITIES[best_agent]
+    reasoning = f"Task type '{task_type}' with {complexity} complexity."
+    if task_type in _AGENT_STRENGTHS[best_agent]:
+        reasoning += f" {best_agent.capitalize()} excels at {task_type}."
+
+    # Determine recommended mode based on task type
+    mode_selector = _MODE_SELECTORS.get(best_agent)
+    recommended_mode = (
+        mode_selector(caps, task_type, complexity) if mode_selector else None
+    )
+
+    return _Selection(
+        agent=best_agent,
+        confidence=_round2(best_score),
+        reasoning=reasoning,
+        recommended_model=caps["models"].get(complexity),
+        recommended_mode=recommended_mode,
+        alternatives=tuple((a, _round2(s)) for a, s in top_agents[1:]),
+    )
+
+
 def select_agent(
     classification: Dict[str, Any],
     prefer_speed: bool = False,
@@ -1025,18 +1644,20 @@ def select_agent(
     recommended_mode, alternative_agents, task_analysis, and optionally
     specialized_task.
     """
-    exclude_agents = list(exclude_agents or [])
+    exclusions = set(exclude_agents or ())
 
     if available_only:
         installed = check_installed_agents()
-        exclude_agents.extend([a for a, inst in installed.items() if not inst])
+        exclusions.update(a for a, inst in installed.items() if not inst)
 
-    exclude_agents = list(set(exclude_agents))
+    # Unknown names can't change the outcome; dropping them keeps cache keys
+    # for the same effective exclusions equal
+    excluded = frozenset(exclusions.intersection(AGENT_CAPABILITIES))
 
     # Check specialized tasks first (planning, architecture, review, etc.)
     specialized = detect_specialized_task(prompt) if prompt else None
 
-    if specialized and specialized["agent"] not in exclude_agents:
+    if specialized and specialized["agent"] not in excluded:
         agent = specialized["agent"]
         caps = AGENT_CAPABILITIES[agent]
         model_tier = specialized["model_tier"]
@@ -1050,11 +1671,7 @@ def select_agent(
         recommended_mode = caps["modes"].get(specialized["mode"])
 
         if agent == "codex" and "reasoning_by_complexity" in caps:
-            reasoning_level = caps["reasoning_by_complexity"].get(model_tier, "medium")
-            if reasoning_level == "high":
-                recommended_mode = caps["modes"].get("high_reasoning")
-            else:
-                recommended_mode = caps["modes"].get("medium_reasoning")
+            recommended_mode = _codex_mode(caps, model_tier)
 
         return {
             "selected_agent": agent,
@@ -1068,57 +1685,15 @@ def select_agent(
         }
 
     # Fall back to general classification-based selection
-    task_type = classification["task_type"]
-    complexity = classification["complexity"]
-
-    agent_scores: Dict[str, float] = {}
-
-    for agent, caps in AGENT_CAPABILITIES.items():
-        if agent in exclude_agents:
-            continue
-
-        score = 0.0
-
-        # Direct strength match
-        if task_type in caps["strengths"]:
-            score += 0.5
-
-        # Task-specific routing bonuses
-        if agent == "gemini" and task_type == "code_generation":
-            score += 0.3
-        elif agent == "cursor" and task_type in [
-            "planning",
-            "architecture",
-            "rewrite",
-            "code_debugging",
-        ]:
-            score += 0.3
-        elif agent == "copilot" and complexity == "complex":
-            score += 0.2
-        elif agent == "codex" and task_type not in [
-            "planning",
-            "architecture",
-            "research",
-        ]:
-            score += 0.1
-
-        # Complexity preference matching
-        if caps["complexity_preference"] == "any":
-            score += 0.15
-        elif caps["complexity_preference"] == complexity:
-            score += 0.25
-        elif caps["complexity_preference"] == "complex" and complexity == "moderate":
-            score += 0.1
-
-        # Speed/cost preferences
-        if prefer_speed and caps["speed"] == "fast":
-            score += 0.2
-        if prefer_cost and caps["cost"] == "low":
-            score += 0.2
-
-        agent_scores[agent] = score
+    selection = _select_general_agent(
+        classification["task_type"],
+        classification["complexity"],
+        prefer_speed,
+        prefer_cost,
+        excluded,
+    )
 
-    if not agent_scores:
+    if selection is None:
         return {
             "selected_agent": "gemini",
             "confidence": 0.5,
@@ -1129,57 +1704,19 @@ def select_agent(
             "task_analysis": classification,
         }
 
-    sorted_agents = sorted(agent_scores.items(), key=lambda x: x[1], reverse=True)
-    best_agent, best_score = sorted_agents[0]
-
-    best_score = min(1.0, max(0.0, best_score))
-
-    caps = AGENT_CAPABILITIES[best_agent]
-    reasoning = f"Task type '{task_type}' with {complexity} complexity."
-    if task_type in caps["strengths"]:
-        reasoning += f" {best_agent.capitalize()} excels at {task_type}."
-
-    alternatives = [
-        {
-            "agent": a,
-            "score": round(s, 2),
-            "description": AGENT_CAPABILITIES[a]["description"],
-        }
-        for a, s in sorted_agents[1:3]
-    ]
-
-    recommended_model = caps["models"].get(complexity)
-
-    # Determine recommended mode based on task type
-    recommended_mode = None
-    if best_agent == "cursor":
-        if task_type in ["planning", "architecture"]:
-            recommended_mode = caps["modes"].get("plan")
-        elif task_type in ["code_review", "code_explanation"]:
-            recommended_mode = caps["modes"].get("ask")
-        else:
-            recommended_mode = caps["modes"].get("agent")
-    elif best_agent == "gemini":
-        if task_type in ["code_generation", "documentation", "rewrite"]:
-            recommended_mode = caps["modes"].get("edit")
-        # Read mode (None) is default for research
-    elif best_agent == "codex":
-        if "reasoning_by_complexity" in caps:
-            reasoning_level = caps["reasoning_by_complexity"].get(complexity, "medium")
-            if reasoning_level == "high":
-                recommended_mode = caps["modes"].get("high_reasoning")
-            else:
-                recommended_mode = caps["modes"].get("medium_reasoning")
-    elif best_agent == "copilot":
-        if task_type in ["code_generation", "refactoring", "rewrite"]:
-            recommended_mode = caps["modes"].get("edit")
-
     return {
-        "selected_agent": best_agent,
-        "confidence": round(best_score, 2),
-        "reasoning": reasoning,
-        "recommended_model": recommended_model,
-        "recommended_mode": recommended_mode,
-        "alternative_agents": alternatives,
+        "selected_agent": selection.agent,
+        "confidence": selection.confidence,
+        "reasoning": selection.reasoning,
+        "recommended_model": selection.recommended_model,
+        "recommended_mode": selection.recommended_mode,
+        "alternative_agents": [
+            {
+                "agent": a,
+                "score": score,
+                "description": AGENT_CAPABILITIES[a]["description"],
+            }
+            for a, score in selection.alternatives
+        ],
         "task_analysis": classification,
     }
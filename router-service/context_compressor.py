@@ -5,10 +5,21 @@ Compresses and filters agent output before returning to Claude Code,
 minimizing token usage while preserving essential information.
 """
 
+import functools
 import re
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+)
 
 
 class CompressionLevel(Enum):
@@ -46,14 +57,41 @@ class ContextCompressor:
 
     # Patterns for content extraction
     CODE_BLOCK_PATTERN = re.compile(r"```[\w]*\n(.*?)```", re.DOTALL)
-    FILE_PATH_PATTERN = re.compile(r"(?:^|\s)([/\w.-]+\.[a-zA-Z]{1,5})(?:\s|$|:|\))")
+    # Only paths with a directory part are reported. Both boundaries are
+    # lookarounds, so the whitespace between two paths is not consumed by
+    # the first match ("edited /a/x.py /b/y.py" yields both)
+    FILE_PATH_PATTERN = re.compile(
+        r"(?<!\S)((?:[\w.-]*/)+[\w.-]*\.[a-zA-Z]{1,5})(?=\s|$|[:)])"
+    )
     ERROR_PATTERN = re.compile(
         r"(?:error|exception|failed|failure|traceback)[:.\s].*", re.IGNORECASE
     )
+    # Matched at the start of a stripped line; only the opening phrase matters
     THINKING_PATTERN = re.compile(
-        r"(?:I think|Let me|I\'ll|I will|First,|Now,|Then,|Finally,|Hmm|Actually,|Wait,).*?(?:\.|$)",
+        r"(?:I think|Let me|I\'ll|I will|First,|Now,|Then,|Finally,|Hmm|Actually,|Wait,)",
         re.IGNORECASE,
     )
+    # A long prose line is kept if it mentions any of these (lower-cased)
+    VERBOSE_KEEP_MARKERS = ("error", "file", "path", "`")
+
+    # Patterns for cleanup and outcome extraction, compiled once per process
+    BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+    TRAILING_SPACE_PATTERN = re.compile(r" +\n")
+    MULTI_SPACE_PATTERN = re.compile(r" {2,}")
+    EMPTY_BULLET_PATTERN = re.compile(r"^\s*[-*]\s*$", re.MULTILINE)
+    FENCED_BLOCK_PATTERN = re.compile(r"(```.*?```)", re.DOTALL)
+    OUTCOME_PATTERNS = (
+        re.compile(
+            r"(?:created|modified|updated|deleted|added|removed|fixed|implemented|completed)\s+.*",
+            re.IGNORECASE,
+        ),
+        re.compile(r"(?:successfully|done|finished|completed).*", re.IGNORECASE),
+    )
+
+    # Case-sensitive twins of the IGNORECASE patterns, for searching
+    # lower-cased ASCII text, which re scans several times faster
+    LOWERCASE_ERROR_PATTERN = re.compile(ERROR_PATTERN.pattern)
+    LOWERCASE_OUTCOME_PATTERNS = tuple(re.compile(p.pattern) for p in OUTCOME_PATTERNS)
 
     def __init__(self, config: Optional[CompressionConfig] = None):
         self.config = config or CompressionConfig()
@@ -73,12 +111,87 @@ class ContextCompressor:
         - compressed_length: Compressed character count
         - compression_ratio: Compressed_length / original_length
         """
-        original_length = len(content)
+        aggressive = level == CompressionLevel.AGGRESSIVE
+        lowered = self._lower_for_scans(content, aggressive)
+        code_blocks, file_paths, errors = self._extract(content, lowered, aggressive)
+        return self._compress_level(
+            content, lowered, level, code_blocks, file_paths, errors
+        )
 
-        # Extract important elements
-        code_blocks = self._extract_code_blocks(content)
-        file_paths = self._extract_file_paths(content)
-        errors = self._extract_errors(content)
+    def compress_levels(
+        self, content: str, levels: Iterable[CompressionLevel]
+    ) -> Dict[CompressionLevel, Dict[str, Any]]:
+        """
+        Compress content at several levels, extracting code blocks, file paths
+        and errors once for all of them.
+
+        Returns compress()'s result dict for each distinct level, keyed by
+        level in the order given.
+        """
+        levels = list(dict.fromkeys(levels))
+        aggressive = CompressionLevel.AGGRESSIVE in levels
+        lowered = self._lower_for_scans(content, aggressive)
+        code_blocks, file_paths, errors = self._extract(content, lowered, aggressive)
+        # Each result gets its own lists so callers can't alias one another's
+        return {
+            level: self._compress_level(
+                content,
+                lowered,
+                level,
+                list(code_blocks),
+                list(file_paths),
+                list(errors),
+            )
+            for level in levels
+        }
+
+    def _lower_for_scans(self, content: str, aggressive: bool) -> Optional[str]:
+        """
+        Lower-case content once for the error and outcome scans (see
+        _find_ignorecase), or return None.
+
+        None means the scans use their IGNORECASE patterns instead: content
+        isn't ASCII, or neither scan runs in this pass.
+        """
+        if (aggressive or self.config.preserve_errors) and content.isascii():
+            return content.lower()
+        return None
+
+    def _extract(
+        self, content: str, lowered: Optional[str], aggressive: bool
+    ) -> Tuple[List[str], List[str], List[str]]:
+        """Extract (code_blocks, file_paths, errors) for compression."""
+        config = self.config
+
+        # Each scan only runs if its result is returned (preserve_* flags) or
+        # feeds the aggressive summary.
+        code_blocks = (
+            self._extract_code_blocks(content)
+            if config.preserve_code or aggressive
+            else []
+        )
+        file_paths = (
+            self._extract_file_paths(content) if config.preserve_file_paths else []
+        )
+        errors = (
+            self._extract_errors(content, lowered)
+            if config.preserve_errors or aggressive
+            else []
+        )
+        return code_blocks, file_paths, errors
+
+    def _compress_level(
+        self,
+        content: str,
+        lowered: Optional[str],
+        level: CompressionLevel,
+        code_blocks: List[str],
+        file_paths: List[str],
+        errors: List[str],
+    ) -> Dict[str, Any]:
+        """Compress content at one level from its extracted elements."""
+        original_length = len(content)
+        config = self.config
 
         # Apply compression based on level
         if level == CompressionLevel.MINIMAL:
@@ -86,20 +199,22 @@ class ContextCompressor:
         elif level == CompressionLevel.MODERATE:
             compressed = self._moderate_compress(content, code_blocks)
         else:  # AGGRESSIVE
-            compressed = self._aggressive_compress(content, code_blocks, errors)
+            compressed = self._aggressive_compress(
+                content, lowered, code_blocks, errors
+            )
 
         # Final cleanup
         compressed = self._cleanup(compressed)
 
         # Truncate if still too long
-        if len(compressed) > self.config.max_tokens * 4:  # ~4 chars per token estimate
+        if len(compressed) > config.max_tokens * 4:  # ~4 chars per token estimate
             compressed = self._truncate_with_summary(compressed)
 
         return {
             "compressed": compressed,
-            "code_blocks": code_blocks if self.config.preserve_code else [],
-            "file_paths": list(file_paths) if self.config.preserve_file_paths else [],
-            "errors": errors if self.config.preserve_errors else [],
+            "code_blocks": code_blocks if config.preserve_code else [],
+            "file_paths": file_paths,
+            "errors": errors if config.preserve_errors else [],
             "original_length": original_length,
             "compressed_length": len(compressed),
             "compression_ratio": round(len(compressed) / original_length, 2)
@@ -111,70 +226,94 @@ class ContextCompressor:
         """Extract all code blocks from content."""
         return self.CODE_BLOCK_PATTERN.findall(content)
 
-    def _extract_file_paths(self, content: str) -> set:
-        """Extract file paths mentioned in content."""
-        paths = set()
-        for match in self.FILE_PATH_PATTERN.finditer(content):
-            path = match.group(1)
-            # Filter out common false positives
-            if not path.startswith(".") and "/" in path:
-                paths.add(path)
-        return paths
-
-    def _extract_errors(self, content: str) -> List[str]:
+    def _extract_file_paths(self, content: str) -> List[str]:
+        """Extract file paths mentioned in content, in order of first mention."""
+        # dict.fromkeys dedupes while keeping order, so output is stable
+        return list(
+            dict.fromkeys(
+                path
+                for path in self.FILE_PATH_PATTERN.findall(content)
+                # Filter out common false positives
+                if not path.startswith(".")
+            )
+        )
+
+    def _extract_errors(self, content: str, lowered: Optional[str]) -> List[str]:
         """Extract error messages from content."""
         errors = []
-        for match in self.ERROR_PATTERN.finditer(content):
-            error = match.group(0).strip()
+        for match in self._find_ignorecase(
+            content, lowered, self.ERROR_PATTERN, self.LOWERCASE_ERROR_PATTERN
+        ):
+            error = match.strip()
             if len(error) > 10:  # Filter very short matches
                 errors.append(error[:500])  # Limit error length
         return errors[:5]  # Max 5 errors
 
+    @staticmethod
+    def _find_ignorecase(
+        content: str,
+        lowered: Optional[str],
+        pattern: Pattern[str],
+        lowercase_pattern: Pattern[str],
+    ) -> Iterator[str]:
+        """
+        Yield the text of each match of an IGNORECASE pattern in content.
+
+        When the pass has a lower-cased copy of (ASCII) content, that copy is
+        searched with the case-sensitive twin instead. Lower-casing ASCII
+        keeps every character in place, so match spans index straight into
+        the original text.
+        """
+        if lowered is not None:
+            for match in lowercase_pattern.finditer(lowered):
+                yield content[match.start() : match.end()]
+        else:
+            for match in pattern.finditer(content):
+                yield match.group(0)
+
     def _minimal_compress(self, content: str) -> str:
         """Light compression - mainly whitespace cleanup."""
         # Remove excessive blank lines
-        content = re.sub(r"\n{3,}", "\n\n", content)
+        content = self.BLANK_LINES_PATTERN.sub("\n\n", content)
         # Remove trailing whitespace
-        content = re.sub(r" +\n", "\n", content)
+        content = self.TRAILING_SPACE_PATTERN.sub("\n", content)
         return content.strip()
 
     def _moderate_compress(self, content: str, code_blocks: List[str]) -> str:
         """Moderate compression - remove verbose explanations, keep structure."""
-        lines = content.split("\n")
+        remove_thinking = self.config.remove_thinking
+        remove_verbose = self.config.remove_verbose_explanations
+        is_thinking = self.THINKING_PATTERN.match
         result_lines = []
         in_code_block = False
 
-        for line in lines:
-            # Track code blocks
-            if line.strip().startswith("```"):
-                in_code_block = not in_code_block
-                result_lines.append(line)
-                continue
-
-            # Always keep code
-            if in_code_block:
-                result_lines.append(line)
-                continue
+        for line in content.split("\n"):
+            stripped = line.strip()
 
-            # Remove thinking/planning phrases
-            if self.config.remove_thinking and self.THINKING_PATTERN.match(
-                line.strip()
-            ):
-                continue
-
-            # Remove very long explanation lines
-            if self.config.remove_verbose_explanations and len(line) > 200:
-                if not any(
-                    marker in line.lower() for marker in ["error", "file", "path", "`"]
-                ):
+            # Track code blocks; fence lines and code are always kept
+            if stripped.startswith("```"):
+                in_code_block = not in_code_block
+            elif not in_code_block:
+                # Remove thinking/planning phrases
+                if remove_thinking and is_thinking(stripped):
                     continue
 
+                # Remove very long explanation lines
+                if remove_verbose and len(line) > 200:
+                    lowered = line.lower()
+                    if not any(m in lowered for m in self.VERBOSE_KEEP_MARKERS):
+                        continue
+
             result_lines.append(line)
 
         return "\n".join(result_lines)
 
     def _aggressive_compress(
-        self, content: str, code_blocks: List[str], errors: List[str]
+        self,
+        content: str,
+        lowered: Optional[str],
+        code_blocks: List[str],
+        errors: List[str],
     ) -> str:
         """Aggressive compression - only essential information."""
         parts = []
@@ -194,14 +333,13 @@ class ContextCompressor:
                 parts.append(f"```\n{block}\n```")
 
         # Extract key outcomes (lines with action words)
-        outcome_patterns = [
-            r"(?:created|modified|updated|deleted|added|removed|fixed|implemented|completed)\s+.*",
-            r"(?:successfully|done|finished|completed).*",
-        ]
-
-        for pattern in outcome_patterns:
-            for match in re.finditer(pattern, content, re.IGNORECASE):
-                outcome = match.group(0).strip()
+        for pattern, lowercase_pattern in zip(
+            self.OUTCOME_PATTERNS, self.LOWERCASE_OUTCOME_PATTERNS
+        ):
+            for match in self._find_ignorecase(
+                content, lowered, pattern, lowercase_pattern
+            ):
+                outcome = match.strip()
                 if len(outcome) < 200:
                     parts.append(f"- {outcome}")
 
@@ -212,32 +350,31 @@ class ContextCompressor:
     def _cleanup(self, content: str) -> str:
         """Final cleanup pass, preserving indentation inside fenced code blocks."""
         # Normalize excessive blank lines (safe for code blocks)
-        content = re.sub(r"\n{3,}", "\n\n", content)
+        content = self.BLANK_LINES_PATTERN.sub("\n\n", content)
 
         # If no fenced code blocks, apply full cleanup
         if "```" not in content:
-            content = re.sub(r" {2,}", " ", content)
-            content = re.sub(r"^\s*[-*]\s*$", "", content, flags=re.MULTILINE)
+            content = self.MULTI_SPACE_PATTERN.sub(" ", content)
+            content = self.EMPTY_BULLET_PATTERN.sub("", content)
             return content.strip()
 
         # Split into code/non-code segments to preserve code block indentation
-        pattern = re.compile(r"(```.*?```)", re.DOTALL)
         parts: List[str] = []
         last_end = 0
 
-        for match in pattern.finditer(content):
+        for match in self.FENCED_BLOCK_PATTERN.finditer(content):
             non_code = content[last_end : match.start()]
             if non_code:
-                non_code = re.sub(r" {2,}", " ", non_code)
-                non_code = re.sub(r"^\s*[-*]\s*$", "", non_code, flags=re.MULTILINE)
+                non_code = self.MULTI_SPACE_PATTERN.sub(" ", non_code)
+                non_code = self.EMPTY_BULLET_PATTERN.sub("", non_code)
                 parts.append(non_code)
             parts.append(match.group(1))
             last_end = match.end()
 
         tail = content[last_end:]
         if tail:
-            tail = re.sub(r" {2,}", " ", tail)
-            tail = re.sub(r"^\s*[-*]\s*$", "", tail, flags=re.MULTILINE)
+            tail = self.MULTI_SPACE_PATTERN.sub(" ", tail)
+            tail = self.EMPTY_BULLET_PATTERN.sub("", tail)
             parts.append(tail)
 
         cleaned = "".join(parts) if parts else content
@@ -246,35 +383,75 @@ class ContextCompressor:
     def _truncate_with_summary(self, content: str) -> str:
         """Truncate content and add summary note."""
         max_chars = self.config.max_tokens * 4
-        truncated = content[:max_chars]
 
-        # Try to end at a natural break
-        last_newline = truncated.rfind("\n")
-        if last_newline > max_chars * 0.8:
-            truncated = truncated[:last_newline]
+        # Try to end at a natural break; find it in place so only the kept
+        # prefix is copied
+        cut = content.rfind("\n", 0, max_chars)
+        if cut <= max_chars * 0.8:
+            cut = max_chars
+
+        return (
+            content[:cut]
+            + "\n\n[Output truncated - see full response in agent session]"
+        )
 
-        return truncated + "\n\n[Output truncated - see full response in agent session]"
+
+_LEVELS_BY_NAME = {level.value: level for level in CompressionLevel}
+
+
+def _level_from_name(level: Union[str, CompressionLevel]) -> CompressionLevel:
+    """Resolve a CompressionLevel or its value; raises ValueError if unknown."""
+    if isinstance(level, CompressionLevel):
+        return level
+    level_enum = _LEVELS_BY_NAME.get(level)
+    if level_enum is None:
+        raise ValueError(f"{level!r} is not a valid CompressionLevel")
+    return level_enum
+
+
+@functools.lru_cache(maxsize=16)
+def _get_compressor(max_tokens: int) -> ContextCompressor:
+    """Reuse one default-config compressor per token budget."""
+    return ContextCompressor(CompressionConfig(max_tokens=max_tokens))
 
 
 def compress_agent_output(
-    output: str, level: str = "moderate", max_tokens: int = 2000
+    output: str,
+    level: Union[str, CompressionLevel] = "moderate",
+    max_tokens: int = 2000,
 ) -> Dict[str, Any]:
     """
     Convenience function to compress agent output.
 
     Args:
         output: Raw agent output string
-        level: "minimal", "moderate", or "aggressive"
+        level: "minimal", "moderate", "aggressive", or a CompressionLevel
         max_tokens: Target maximum token count
 
     Returns:
         Dict with compressed content and metadata
     """
-    config = CompressionConfig(max_tokens=max_tokens)
-    compressor = ContextCompressor(config)
+    return _get_compressor(max_tokens).compress(output, _level_from_name(level))
+
+
+def compress_agent_output_levels(
+    output: str,
+    levels: Iterable[Union[str, CompressionLevel]],
+    max_tokens: int = 2000,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Compress agent output at several levels in one call.
+
+    Extraction is shared across levels (see ContextCompressor.compress_levels).
 
-    level_enum = CompressionLevel(level)
-    return compressor.compress(output, level_enum)
+    Returns:
+        Dict mapping each distinct level name, in the order given, to the
+        result compress_agent_output() would return for it
+    """
+    results = _get_compressor(max_tokens).compress_levels(
+        output, [_level_from_name(level) for level in levels]
+    )
+    return {level.value: result for level, result in results.items()}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+"""
+Multi-keyword matching for the rule-based classifier.
+
+KeywordMatcher finds which members of a fixed keyword set occur in a
+string. When pyahocorasick is installed, all keywords are compiled into a
+single Aho-Corasick automaton so a prompt is scanned once regardless of
+how many keywords there are. Without it, matching falls back to one
+C-level substring search per keyword (still faster than a pure-Python
+trie walk).
+"""
+
+import sys
+from typing import Iterable, List
+
+try:
+    import ahocorasick
+except ImportError:  # Optional accelerator; see requirements.txt
+    ahocorasick = None
+
+
+class KeywordMatcher:
+    """Finds which of a fixed set of keywords occur in a string."""
+
+    def __init__(self, keywords: Iterable[str]):
+        # Deduplicate while keeping registration order; results follow it.
+        # Interning lets matchers sharing a keyword return the same object,
+        # so dict lookups on returned keywords hit the identity fast path.
+        self.keywords = tuple(dict.fromkeys(sys.intern(kw) for kw in keywords))
+        # find() must test every keyword, so order can't save work there.
+        # search() stops at the first hit: try short (more common) keywords
+        # first so typical prompts exit early.
+        self._search_order = tuple(sorted(self.keywords, key=len))
+        self._automaton = None
+
+        if ahocorasick is not None and self.keywords:
+            # Values are plain keyword indices, so store them as C ints
+            # rather than one Python object per trie node
+            automaton = ahocorasick.Automaton(ahocorasick.STORE_INTS)
+            for index, keyword in enumerate(self.keywords):
+                automaton.add_word(keyword, index)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def find(self, text: str) -> List[str]:
+        """Return every keyword found in text, in registration order."""
+        if self._automaton is None:
+            return [kw for kw in self.keywords if kw in text]
+
+        indices = {index for _, index in self._automaton.iter(text)}
+        return [self.keywords[i] for i in sorted(indices)]
+
+    def search(self, text: str) -> bool:
+        """Return True if any keyword occurs in text."""
+        if self._automaton is None:
+            return any(kw in text for kw in self._search_order)
+
+        for _ in self._automaton.iter(text):
+            return True
+        return False
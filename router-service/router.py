@@ -7,22 +7,37 @@ FastAPI server that routes tasks to appropriate AI CLI tools
 Start: uvicorn router:app --host 127.0.0.1 --port 8765
 """
 
-from typing import Any, Dict, List, Optional
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from classifier import (
     AGENT_CAPABILITIES,
     check_installed_agents,
     classify_prompt,
+    classify_prompts,
     select_agent,
+    thaw,
 )
-from context_compressor import compress_agent_output
-from fastapi import FastAPI, HTTPException
+from context_compressor import compress_agent_output, compress_agent_output_levels
+from fastapi import FastAPI, HTTPException, Response
 from pydantic import BaseModel
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Probe installed CLIs before serving so the first /route doesn't pay for it."""
+    # Later requests reuse the TTL cache in check_installed_agents();
+    # GET /agents/installed?refresh=true re-probes on demand
+    check_installed_agents()
+    yield
+
+
 app = FastAPI(
     title="Agent Router Service",
     description="Routes tasks to optimal AI CLI tools using rule-based classification",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -43,6 +58,16 @@ class RouteRequest(BaseModel):
     debug: bool = False
 
 
+class RouteBatchRequest(BaseModel):
+    """Request model for routing several prompts with shared preferences."""
+
+    prompts: List[str]
+    prefer_speed: bool = False
+    prefer_cost: bool = False
+    exclude_agents: Optional[List[str]] = None
+    only_available: bool = True
+
+
 class RouteResponse(BaseModel):
     """Response model with routing decision and analysis."""
 
@@ -83,6 +108,14 @@ class CompressRequest(BaseModel):
     max_tokens: int = 2000
 
 
+class CompressLevelsRequest(BaseModel):
+    """Request model for compressing the same content at several levels."""
+
+    content: str
+    levels: List[str] = ["minimal", "moderate", "aggressive"]
+    max_tokens: int = 2000
+
+
 class CompressResponse(BaseModel):
     """Response model for compressed content."""
 
@@ -100,17 +133,64 @@ class CompressResponse(BaseModel):
 # ============================================================================
 
 
-@app.post("/route", response_model=RouteResponse)
-async def route_task(request: RouteRequest) -> RouteResponse:
-    """Route a task to the optimal AI CLI agent."""
+def _installed_split() -> Tuple[List[str], List[str]]:
+    """Return the (available, unavailable) agent names."""
     installed = check_installed_agents()
     available = [a for a, is_inst in installed.items() if is_inst]
     unavailable = [a for a, is_inst in installed.items() if not is_inst]
+    return available, unavailable
+
+
+def _exclusions(
+    exclude_agents: Optional[List[str]], only_available: bool, unavailable: List[str]
+) -> List[str]:
+    """Combine requested exclusions with the uninstalled agents if required."""
+    excluded = list(exclude_agents or [])
+    if only_available:
+        excluded.extend(unavailable)
+    return list(set(excluded))
+
+
+def _select_route(
+    prompt: str,
+    classification: Dict[str, Any],
+    prefer_speed: bool,
+    prefer_cost: bool,
+    exclude_agents: List[str],
+    available: List[str],
+    unavailable: List[str],
+) -> RouteResponse:
+    """Pick an agent for a classified prompt and build the /route response."""
+    result = select_agent(
+        classification,
+        prefer_speed=prefer_speed,
+        prefer_cost=prefer_cost,
+        exclude_agents=exclude_agents,
+        available_only=False,  # Already filtered by the caller
+        prompt=prompt,
+    )
+
+    return RouteResponse(
+        selected_agent=result["selected_agent"],
+        confidence=result["confidence"],
+        reasoning=result["reasoning"],
+        task_analysis=result["task_analysis"],
+        alternative_agents=result["alternative_agents"],
+        recommended_model=result.get("recommended_model"),
+        recommended_mode=result.get("recommended_mode"),
+        specialized_task=result.get("specialized_task"),
+        available_agents=available,
+        unavailable_agents=unavailable,
+    )
 
-    exclude_agents = list(request.exclude_agents or [])
-    if request.only_available:
-        exclude_agents.extend(unavailable)
-    exclude_agents = list(set(exclude_agents))
+
+@app.post("/route", response_model=RouteResponse)
+async def route_task(request: RouteRequest) -> RouteResponse:
+    """Route a task to the optimal AI CLI agent."""
+    available, unavailable = _installed_split()
+    exclude_agents = _exclusions(
+        request.exclude_agents, request.only_available, unavailable
+    )
 
     if request.force_agent:
         if request.force_agent not in AGENT_CAPABILITIES:
@@ -141,28 +221,45 @@ async def route_task(request: RouteRequest) -> RouteResponse:
 
     classification = classify_prompt(request.prompt, debug=request.debug)
 
-    result = select_agent(
+    return _select_route(
+        request.prompt,
         classification,
-        prefer_speed=request.prefer_speed,
-        prefer_cost=request.prefer_cost,
-        exclude_agents=exclude_agents,
-        available_only=False,  # Already filtered above
-        prompt=request.prompt,
+        request.prefer_speed,
+        request.prefer_cost,
+        exclude_agents,
+        available,
+        unavailable,
     )
 
-    return RouteResponse(
-        selected_agent=result["selected_agent"],
-        confidence=result["confidence"],
-        reasoning=result["reasoning"],
-        task_analysis=result["task_analysis"],
-        alternative_agents=result["alternative_agents"],
-        recommended_model=result.get("recommended_model"),
-        recommended_mode=result.get("recommended_mode"),
-        specialized_task=result.get("specialized_task"),
-        available_agents=available,
-        unavailable_agents=unavailable,
+
+@app.post("/route/batch", response_model=List[RouteResponse])
+async def route_batch(request: RouteBatchRequest) -> List[RouteResponse]:
+    """
+    Route several prompts with the same preferences in one call.
+
+    Results are in prompt order. The installed-agent check and exclusion list
+    are resolved once for the whole batch.
+    """
+    available, unavailable = _installed_split()
+    exclude_agents = _exclusions(
+        request.exclude_agents, request.only_available, unavailable
     )
 
+    return [
+        _select_route(
+            prompt,
+            classification,
+            request.prefer_speed,
+            request.prefer_cost,
+            exclude_agents,
+            available,
+            unavailable,
+        )
+        for prompt, classification in zip(
+            request.prompts, classify_prompts(request.prompts)
+        )
+    ]
+
 
 @app.post("/classify", response_model=ClassifyResponse)
 async def classify_task(request: ClassifyRequest) -> ClassifyResponse:
@@ -178,26 +275,60 @@ async def classify_task(request: ClassifyRequest) -> ClassifyResponse:
     )
 
 
-@app.post("/compress", response_model=CompressResponse)
-async def compress_content(request: CompressRequest) -> CompressResponse:
-    """Compress agent output to minimize token usage."""
-    if request.level not in ["minimal", "moderate", "aggressive"]:
+def _check_compression_level(level: str) -> None:
+    """Reject unknown compression levels with a 400."""
+    if level not in ["minimal", "moderate", "aggressive"]:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid level: {request.level}. Valid levels: minimal, moderate, aggressive",
+            detail=f"Invalid level: {level}. Valid levels: minimal, moderate, aggressive",
         )
 
-    result = compress_agent_output(
+
+@app.post("/compress", response_model=CompressResponse)
+async def compress_content(request: CompressRequest) -> Dict[str, Any]:
+    """Compress agent output to minimize token usage."""
+    _check_compression_level(request.level)
+
+    # Returned as-is: FastAPI validates it against response_model once, where
+    # building CompressResponse here would validate (and, on older FastAPI,
+    # dump and re-validate) the same fields twice
+    return compress_agent_output(
         request.content, level=request.level, max_tokens=request.max_tokens
     )
 
-    return CompressResponse(**result)
+
+@app.post("/compress/levels", response_model=Dict[str, CompressResponse])
+async def compress_content_levels(request: CompressLevelsRequest) -> Dict[str, Any]:
+    """
+    Compress the same agent output at several levels in one call.
+
+    Returns a result per distinct level, keyed by level name. Code blocks,
+    file paths and errors are extracted once and shared across levels.
+    """
+    for level in request.levels:
+        _check_compression_level(level)
+
+    return compress_agent_output_levels(
+        request.content, request.levels, max_tokens=request.max_tokens
+    )
+
+
+# AGENT_CAPABILITIES is read-only, so its JSON body is rendered once at import
+# (with JSONResponse's settings) instead of being copied and encoded per call.
+# The route still declares response_model so OpenAPI publishes the schema;
+# FastAPI doesn't validate a Response returned directly.
+_AGENTS_BODY = json.dumps(
+    thaw(AGENT_CAPABILITIES),
+    ensure_ascii=False,
+    allow_nan=False,
+    separators=(",", ":"),
+).encode("utf-8")
 
 
-@app.get("/agents")
-async def list_agents() -> Dict[str, Any]:
+@app.get("/agents", response_model=Dict[str, Any])
+async def list_agents() -> Response:
     """List all available agents and their capabilities."""
-    return AGENT_CAPABILITIES
+    return Response(content=_AGENTS_BODY, media_type="application/json")
 
 
 @app.get("/agents/installed")
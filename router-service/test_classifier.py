@@ -0,0 +1,69 @@
+"""
+Unit tests for the shared classifier.
+
+Run with: python -m pytest test_classifier.py
+"""
+
+import pytest
+
+from classifier import _count_keyword_groups, _normalize
+
+
+def group_counts(prompt: str):
+    """Return the per-group keyword counts for a prompt."""
+    return _count_keyword_groups(_normalize(prompt))
+
+
+# ============================================================================
+# Whole-word keyword groups
+# ============================================================================
+
+
+# Substring hits that whole-word matching is meant to drop
+@pytest.mark.parametrize(
+    "prompt, group",
+    [
+        ("Research how other projects handle rate limiting", "math"),
+        ("Calculate the time complexity here", "high_complexity"),
+        ("Restart the computer after the update", "math"),
+        ("Resort the logistics queue", "math"),
+        ("Resort the logistics queue", "summary"),
+        ("Add a component for the settings page", "low_complexity"),
+        ("Justify the design to someone new", "low_complexity"),
+    ],
+)
+def test_whole_word_group_ignores_substring(prompt, group):
+    assert group_counts(prompt)[group] == 0
+
+
+# Inflected forms that must still count
+@pytest.mark.parametrize(
+    "word, group",
+    [
+        ("summarized", "summary"),
+        ("summarizing", "summary"),
+        ("summaries", "summary"),
+        ("briefly", "summary"),
+        ("calculated", "math"),
+        ("calculating", "math"),
+        ("computing", "math"),
+        ("searching", "math"),
+        ("sorted", "math"),
+        ("algorithms", "math"),
+        ("optimized", "math"),
+        ("asynchronous", "high_complexity"),
+        ("concurrently", "high_complexity"),
+        ("simply", "low_complexity"),
+        ("quickly", "low_complexity"),
+    ],
+)
+def test_whole_word_group_matches_inflection(word, group):
+    assert group_counts(f"Please look at this, {word} if you can")[group] == 1
+
+
+def test_whole_word_keyword_counts_once():
+    assert group_counts("Sort it, then sort it again")["math"] == 1
+
+
+def test_multi_word_phrase_matches_as_substring():
+    assert group_counts("List the key points of the design")["summary"] == 1
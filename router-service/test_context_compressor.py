@@ -0,0 +1,95 @@
+"""
+Unit tests for the context compressor.
+
+Run with: python -m pytest test_context_compressor.py
+"""
+
+import pytest
+
+from context_compressor import (
+    CompressionLevel,
+    ContextCompressor,
+    compress_agent_output,
+    compress_agent_output_levels,
+)
+
+SAMPLE_OUTPUT = """
+I think I'll start by analyzing the codebase structure.
+
+```python
+def authenticate(user, password):
+    return create_session(user)
+```
+
+I modified the file at /src/auth/login.py to add the new feature.
+
+Error: Could not find config.json in the expected location.
+"""
+
+
+# ============================================================================
+# Level resolution
+# ============================================================================
+
+
+@pytest.mark.parametrize("level", list(CompressionLevel))
+def test_compress_accepts_level_members(level):
+    assert compress_agent_output(SAMPLE_OUTPUT, level) == compress_agent_output(
+        SAMPLE_OUTPUT, level.value
+    )
+
+
+def test_compress_levels_accepts_level_members():
+    results = compress_agent_output_levels(SAMPLE_OUTPUT, list(CompressionLevel))
+    assert results == compress_agent_output_levels(
+        SAMPLE_OUTPUT, [level.value for level in CompressionLevel]
+    )
+
+
+def test_compress_rejects_unknown_level():
+    with pytest.raises(ValueError, match="'extreme' is not a valid"):
+        compress_agent_output(SAMPLE_OUTPUT, "extreme")
+
+
+def test_compress_levels_rejects_unknown_level():
+    with pytest.raises(ValueError, match="'extreme' is not a valid"):
+        compress_agent_output_levels(SAMPLE_OUTPUT, ["minimal", "extreme"])
+
+
+# ============================================================================
+# Several levels in one call
+# ============================================================================
+
+
+def test_compress_levels_matches_compress():
+    compressor = ContextCompressor()
+    results = compressor.compress_levels(SAMPLE_OUTPUT, list(CompressionLevel))
+    assert list(results) == list(CompressionLevel)
+    for level, result in results.items():
+        assert result == compressor.compress(SAMPLE_OUTPUT, level)
+
+
+def test_compress_levels_results_do_not_share_lists():
+    compressor = ContextCompressor()
+    results = compressor.compress_levels(SAMPLE_OUTPUT, list(CompressionLevel))
+    results[CompressionLevel.MINIMAL]["code_blocks"].append("changed")
+    assert "changed" not in results[CompressionLevel.MODERATE]["code_blocks"]
+
+
+def test_compress_agent_output_levels_matches_compress_agent_output():
+    levels = ["aggressive", "minimal"]
+    results = compress_agent_output_levels(SAMPLE_OUTPUT, levels)
+    assert results == {
+        level: compress_agent_output(SAMPLE_OUTPUT, level) for level in levels
+    }
+
+
+def test_compress_agent_output_levels_dedupes_in_order():
+    results = compress_agent_output_levels(
+        SAMPLE_OUTPUT, ["moderate", "minimal", "moderate", CompressionLevel.MINIMAL]
+    )
+    assert list(results) == ["moderate", "minimal"]
+
+
+def test_compress_agent_output_levels_empty():
+    assert compress_agent_output_levels(SAMPLE_OUTPUT, []) == {}
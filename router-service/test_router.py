@@ -5,35 +5,115 @@ Test script for the Agent Router Service.
 Run with: python test_router.py
 
 Requires the service to be running: uvicorn router:app --host 127.0.0.1 --port 8765
+
+Checks raise AssertionError explicitly rather than using assert statements,
+so they still run under python -O.
 """
 
+import atexit
 import requests
-from typing import Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, List
 
 BASE_URL = "http://127.0.0.1:8765"
+HEALTH_URL = f"{BASE_URL}/health"
+ROUTE_URL = f"{BASE_URL}/route"
+ROUTE_BATCH_URL = f"{BASE_URL}/route/batch"
+CLASSIFY_URL = f"{BASE_URL}/classify"
+COMPRESS_URL = f"{BASE_URL}/compress"
+COMPRESS_LEVELS_URL = f"{BASE_URL}/compress/levels"
+
+# Shared keep-alive connection pool, so each test call reuses one socket
+# instead of opening (and tearing down) a new connection per request
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+# The service is on loopback: skip per-request proxy/netrc environment lookups
+SESSION.trust_env = False
+atexit.register(SESSION.close)
+
+# Agents that may be picked when test_preferences excludes codex and copilot
+ALLOWED_WHEN_EXCLUDED = frozenset({"cursor", "gemini"})
+
+# (connect, read) seconds, so a hung service fails the run instead of stalling it
+REQUEST_TIMEOUT = (1.0, 10.0)
+
+# Sample agent output for the compression tests: filler narration around a
+# code block, a file path, and an error
+VERBOSE_CONTENT = """
+    I think I'll start by analyzing the codebase structure. Let me look at the files.
+
+    First, I'll examine the main entry point. Actually, let me reconsider the approach.
+
+    Here's the code I found:
+
+    ```python
+    def authenticate(user, password):
+        if not validate_credentials(user, password):
+            raise AuthError("Invalid credentials")
+        return create_session(user)
+    ```
+
+    I modified the file at /src/auth/login.py to add the new feature.
+
+    The implementation is complete. I successfully added the authentication module.
+    It handles user login, session management, and token refresh.
+
+    Error: Could not find config.json in the expected location.
+
+    Let me now explain in great detail what each line does and why I chose this
+    particular implementation pattern over the many alternatives that were available...
+    """
 
 
 def test_health():
     """Test health endpoint."""
-    resp = requests.get(f"{BASE_URL}/health")
-    assert resp.status_code == 200
+    resp = SESSION.get(HEALTH_URL, timeout=REQUEST_TIMEOUT)
+    if resp.status_code != 200:
+        raise AssertionError(f"Health check failed with status {resp.status_code}")
     data = resp.json()
-    assert data["status"] == "healthy"
+    if data["status"] != "healthy":
+        raise AssertionError(f"Unexpected health status: {data['status']}")
     print("✓ Health check passed")
 
 
+def post_route(prompt: str) -> Dict[str, Any]:
+    """POST a prompt to /route and return the decoded response."""
+    resp = SESSION.post(
+        ROUTE_URL,
+        json={"prompt": prompt},
+        timeout=REQUEST_TIMEOUT,
+    )
+    if resp.status_code != 200:
+        print(f"\nERROR: {resp.status_code}")
+        print(f"Response: {resp.text}")
+        raise AssertionError(f"Route failed with status {resp.status_code}: {resp.text}")
+    return resp.json()
+
+
 def test_route(prompt: str, expected_agent: str = None) -> Dict[str, Any]:
     """Test routing a prompt."""
-    resp = requests.post(
-        f"{BASE_URL}/route",
-        json={"prompt": prompt}
+    return check_route(prompt, post_route(prompt), expected_agent)
+
+
+def post_route_batch(prompts: List[str]) -> List[Dict[str, Any]]:
+    """Route several prompts with one /route/batch call."""
+    resp = SESSION.post(
+        ROUTE_BATCH_URL,
+        json={"prompts": prompts},
+        timeout=REQUEST_TIMEOUT,
     )
     if resp.status_code != 200:
         print(f"\nERROR: {resp.status_code}")
         print(f"Response: {resp.text}")
-        raise AssertionError(f"Route failed with status {resp.status_code}: {resp.text}")
-    data = resp.json()
+        raise AssertionError(f"Batch route failed with status {resp.status_code}: {resp.text}")
+    results = resp.json()
+    if len(results) != len(prompts):
+        raise AssertionError(f"Expected {len(prompts)} batch results, got {len(results)}")
+    return results
+
 
+def check_route(prompt: str, data: Dict[str, Any], expected_agent: str = None) -> Dict[str, Any]:
+    """Print a /route response and check its task type."""
     task_type = data['task_analysis']['task_type']
     print(f"\nPrompt: {prompt[:60]}...")
     print(f"  → Task Type: {task_type} (conf: {data['task_analysis']['task_type_confidence']:.2f})")
@@ -50,7 +130,7 @@ def test_route(prompt: str, expected_agent: str = None) -> Dict[str, Any]:
             print(f"  ✓ Task type matched: {expected_agent}")
         else:
             print(f"  ✗ Expected task type: {expected_agent}, got: {task_type}")
-            assert task_type == expected_agent, (
+            raise AssertionError(
                 f"Expected task type '{expected_agent}', got '{task_type}'"
             )
 
@@ -59,9 +139,10 @@ def test_route(prompt: str, expected_agent: str = None) -> Dict[str, Any]:
 
 def test_classify(prompt: str):
     """Test classification only."""
-    resp = requests.post(
-        f"{BASE_URL}/classify",
-        json={"prompt": prompt}
+    resp = SESSION.post(
+        CLASSIFY_URL,
+        json={"prompt": prompt},
+        timeout=REQUEST_TIMEOUT,
     )
     if resp.status_code != 200:
         print(f"\nERROR: {resp.status_code}")
@@ -80,39 +161,19 @@ def test_classify(prompt: str):
 
 def test_compress():
     """Test context compression."""
-    verbose_content = """
-    I think I'll start by analyzing the codebase structure. Let me look at the files.
-
-    First, I'll examine the main entry point. Actually, let me reconsider the approach.
-
-    Here's the code I found:
-
-    ```python
-    def authenticate(user, password):
-        if not validate_credentials(user, password):
-            raise AuthError("Invalid credentials")
-        return create_session(user)
-    ```
-
-    I modified the file at /src/auth/login.py to add the new feature.
-
-    The implementation is complete. I successfully added the authentication module.
-    It handles user login, session management, and token refresh.
-
-    Error: Could not find config.json in the expected location.
-
-    Let me now explain in great detail what each line does and why I chose this
-    particular implementation pattern over the many alternatives that were available...
-    """
-
-    for level in ["minimal", "moderate", "aggressive"]:
-        resp = requests.post(
-            f"{BASE_URL}/compress",
-            json={"content": verbose_content, "level": level, "max_tokens": 500}
-        )
-        assert resp.status_code == 200
-        data = resp.json()
+    levels = ["minimal", "moderate", "aggressive"]
+    resp = SESSION.post(
+        COMPRESS_LEVELS_URL,
+        json={"content": VERBOSE_CONTENT, "levels": levels, "max_tokens": 500},
+        timeout=REQUEST_TIMEOUT,
+    )
+    if resp.status_code != 200:
+        raise AssertionError(f"Compress levels failed with status {resp.status_code}")
+    results = resp.json()
+    if list(results) != levels:
+        raise AssertionError(f"Expected results for {levels}, got {list(results)}")
 
+    for level, data in results.items():
         print(f"\nCompression ({level}):")
         print(f"  → Original: {data['original_length']} chars")
         print(f"  → Compressed: {data['compressed_length']} chars")
@@ -120,6 +181,17 @@ def test_compress():
         print(f"  → Code blocks: {len(data['code_blocks'])}")
         print(f"  → Errors: {len(data['errors'])}")
 
+    # The single-level endpoint must agree with the batched one
+    resp = SESSION.post(
+        COMPRESS_URL,
+        json={"content": VERBOSE_CONTENT, "level": "moderate", "max_tokens": 500},
+        timeout=REQUEST_TIMEOUT,
+    )
+    if resp.status_code != 200:
+        raise AssertionError(f"Compress (moderate) failed with status {resp.status_code}")
+    if resp.json() != results["moderate"]:
+        raise AssertionError("/compress and /compress/levels disagree for 'moderate'")
+
     print("✓ Compression tests passed")
 
 
@@ -131,29 +203,33 @@ def test_preferences():
     test_route(prompt)
 
     # Speed preference
-    resp = requests.post(
-        f"{BASE_URL}/route",
-        json={"prompt": prompt, "prefer_speed": True}
+    resp = SESSION.post(
+        ROUTE_URL,
+        json={"prompt": prompt, "prefer_speed": True},
+        timeout=REQUEST_TIMEOUT,
     )
     fast_agent = resp.json()["selected_agent"]
     print(f"\n  With prefer_speed: {fast_agent}")
 
     # Cost preference
-    resp = requests.post(
-        f"{BASE_URL}/route",
-        json={"prompt": prompt, "prefer_cost": True}
+    resp = SESSION.post(
+        ROUTE_URL,
+        json={"prompt": prompt, "prefer_cost": True},
+        timeout=REQUEST_TIMEOUT,
     )
     cheap_agent = resp.json()["selected_agent"]
     print(f"  With prefer_cost: {cheap_agent}")
 
     # Exclude agents
-    resp = requests.post(
-        f"{BASE_URL}/route",
-        json={"prompt": prompt, "exclude_agents": ["codex", "copilot"]}
+    resp = SESSION.post(
+        ROUTE_URL,
+        json={"prompt": prompt, "exclude_agents": ["codex", "copilot"]},
+        timeout=REQUEST_TIMEOUT,
     )
     limited_agent = resp.json()["selected_agent"]
     print(f"  Excluding codex/copilot: {limited_agent}")
-    assert limited_agent in ["cursor", "gemini"]
+    if limited_agent not in ALLOWED_WHEN_EXCLUDED:
+        raise AssertionError(f"Excluded agent selected: {limited_agent}")
 
     print("✓ Preference tests passed")
 
@@ -192,10 +268,17 @@ def run_all_tests():
         ("Summarize the changes in the last 10 commits", "summarization"),
         ("What's the best approach for caching user sessions?", "open_qa"),
         ("Calculate the time complexity of this algorithm", "math"),
+        # Whole-word keywords: "search" inside "research" is not a math hit,
+        # while listed forms like "sorting" still are
+        ("Research how other projects handle rate limiting", "research"),
+        ("Analyze the time complexity of the sorting routine", "math"),
     ]
 
-    for prompt, expected in test_cases:
-        test_route(prompt, expected)
+    # One round trip for all cases; results come back in prompt order
+    responses = post_route_batch([prompt for prompt, _ in test_cases])
+
+    for (prompt, expected), data in zip(test_cases, responses):
+        check_route(prompt, data, expected)
 
     print("\n" + "-" * 40)
     print("Testing Classification Only")
@@ -204,6 +287,12 @@ def run_all_tests():
     test_classify("Calculate the fibonacci sequence for n=100")
     test_classify("What does this error message mean?")
 
+    # "complex" inside "complexity" must not count as a high-complexity keyword
+    data = test_classify("Calculate the time complexity of this algorithm")
+    signals = data["all_scores"]["complexity_signals"]
+    if any(signal.startswith("high_kw") for signal in signals):
+        raise AssertionError(f"'time complexity' counted as high_kw: {signals}")
+
     print("\n" + "-" * 40)
     print("Testing Compression")
     print("-" * 40)
@@ -0,0 +1,124 @@
+"""
+In-process tests for the Agent Router Service endpoints.
+
+Run with: python -m pytest test_router_api.py
+
+Unlike test_router.py, no running service is needed: requests go through
+FastAPI's TestClient (requires httpx).
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from classifier import AGENT_CAPABILITIES, thaw
+from router import app
+
+BATCH_PROMPTS = [
+    "Fix the authentication bug in login.py",
+    "Summarize the changes in the last 10 commits",
+    "Write a REST API endpoint for user registration",
+    "Calculate the time complexity of this algorithm",
+]
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+# ============================================================================
+# /route/batch
+# ============================================================================
+
+
+def test_route_batch_matches_route(client):
+    preferences = {"prefer_speed": True, "exclude_agents": ["codex"]}
+    resp = client.post("/route/batch", json={"prompts": BATCH_PROMPTS, **preferences})
+    assert resp.status_code == 200
+
+    # One result per prompt, in prompt order, each as /route would return it
+    expected = []
+    for prompt in BATCH_PROMPTS:
+        single = client.post("/route", json={"prompt": prompt, **preferences})
+        assert single.status_code == 200
+        expected.append(single.json())
+    assert resp.json() == expected
+
+
+def test_route_batch_preserves_order(client):
+    forward = client.post("/route/batch", json={"prompts": BATCH_PROMPTS}).json()
+    backward = client.post("/route/batch", json={"prompts": BATCH_PROMPTS[::-1]}).json()
+    assert backward == forward[::-1]
+
+
+def test_route_batch_empty(client):
+    resp = client.post("/route/batch", json={"prompts": []})
+    assert resp.status_code == 200
+    assert resp.json() == []
+
+
+# ============================================================================
+# /compress/levels
+# ============================================================================
+
+COMPRESS_CONTENT = """
+Let me look at the files first.
+
+```python
+def authenticate(user, password):
+    return create_session(user)
+```
+
+I modified /src/auth/login.py. Error: Could not find config.json anywhere.
+"""
+
+
+def test_compress_levels_matches_compress(client):
+    levels = ["aggressive", "minimal", "moderate"]
+    resp = client.post(
+        "/compress/levels", json={"content": COMPRESS_CONTENT, "levels": levels}
+    )
+    assert resp.status_code == 200
+    results = resp.json()
+    assert list(results) == levels
+    for level in levels:
+        single = client.post(
+            "/compress", json={"content": COMPRESS_CONTENT, "level": level}
+        )
+        assert results[level] == single.json()
+
+
+def test_compress_levels_dedupes(client):
+    resp = client.post(
+        "/compress/levels",
+        json={"content": COMPRESS_CONTENT, "levels": ["minimal", "minimal"]},
+    )
+    assert resp.status_code == 200
+    assert list(resp.json()) == ["minimal"]
+
+
+def test_compress_levels_rejects_unknown_level(client):
+    resp = client.post(
+        "/compress/levels",
+        json={"content": COMPRESS_CONTENT, "levels": ["minimal", "extreme"]},
+    )
+    assert resp.status_code == 400
+    assert "extreme" in resp.json()["detail"]
+
+
+# ============================================================================
+# /agents
+# ============================================================================
+
+
+def test_agents_returns_capabilities(client):
+    resp = client.get("/agents")
+    assert resp.status_code == 200
+    assert resp.json() == thaw(AGENT_CAPABILITIES)
+
+
+def test_agents_schema_is_published(client):
+    operation = client.get("/openapi.json").json()["paths"]["/agents"]["get"]
+    schema = operation["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema["type"] == "object"